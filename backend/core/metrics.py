@@ -0,0 +1,132 @@
+import bisect
+import threading
+
+from django.http import HttpResponse
+
+# Seconds, from a cache hit to a slow cold search
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus-style histogram with one series per combination of
+    label values. Metrics live in the memory of the process that recorded them,
+    so every worker process exposes its own and Prometheus sums them.
+    """
+
+    def __init__(self, name, help, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = sorted(
+                (key, dict(value, buckets=list(value["buckets"])))
+                for key, value in self.series.items()
+            )
+        for key, value in series:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bucket, count in zip(self.buckets, value["buckets"]):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{format_labels({**labels, 'le': str(bucket)})} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{format_labels({**labels, 'le': '+Inf'})} {value['count']}"
+            )
+            lines.append(
+                f"{self.name}_sum{format_labels(labels)} {value['sum']}"
+            )
+            lines.append(
+                f"{self.name}_count{format_labels(labels)} {value['count']}"
+            )
+        return "\n".join(lines)
+
+
+def format_labels(labels):
+    escaped = {
+        label: value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        for label, value in labels.items()
+    }
+    return (
+        "{"
+        + ",".join(f'{label}="{value}"' for label, value in escaped.items())
+        + "}"
+    )
+
+
+registry = []
+
+
+def histogram(name, help, labels, buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, help, labels, buckets)
+    registry.append(metric)
+    return metric
+
+
+stage_seconds = histogram(
+    "search_stage_seconds",
+    "Time spent in each stage of the search pipeline",
+    ["stage"],
+)
+google_api_seconds = histogram(
+    "google_api_seconds",
+    "Time spent in each Google Maps API call, retries included",
+    ["api", "outcome"],
+)
+request_seconds = histogram(
+    "http_request_seconds",
+    "Time spent serving a request",
+    ["route", "method", "status"],
+)
+
+
+def metrics(request):
+    """
+    Prometheus text exposition of every registered metric. Only routed when
+    METRICS_ENABLED is set.
+    """
+    return HttpResponse(
+        "\n".join(metric.render() for metric in registry) + "\n",
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,162 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import request_seconds
+from .profiling import profile_queries
+from .timing import current_spans, server_timing_header, stage_totals
+
+timing_logger = logging.getLogger("core.timing")
+queries_logger = logging.getLogger("core.queries")
+
+
+class TimingMiddleware:
+    """
+    Collects the core.timing spans of every request. Requests that ran
+    instrumented stages get a Server-Timing header (shown in the browser's
+    network tab) when SERVER_TIMING_ENABLED is set, and a JSON log line on
+    core.timing. Streaming responses only report the stages that ran before the
+    response started.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        spans = []
+        token = current_spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_spans.reset(token)
+        self.process_timings(
+            request, response, spans, time.perf_counter() - start
+        )
+        return response
+
+    async def __acall__(self, request):
+        spans = []
+        token = current_spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_spans.reset(token)
+        self.process_timings(
+            request, response, spans, time.perf_counter() - start
+        )
+        return response
+
+    def process_timings(self, request, response, spans, total_seconds):
+        route = (
+            request.resolver_match.route
+            if request.resolver_match
+            else "unmatched"
+        )
+        request_seconds.observe(
+            total_seconds,
+            route=route,
+            method=request.method,
+            status=response.status_code,
+        )
+        if len(spans) == 0:
+            return
+
+        totals = stage_totals(spans)
+        if settings.SERVER_TIMING_ENABLED:
+            response["Server-Timing"] = server_timing_header(
+                totals, total_seconds
+            )
+
+        record = {
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(total_seconds * 1000, 1),
+            "stages_ms": {
+                stage: round(seconds * 1000, 1)
+                for stage, seconds in totals.items()
+            },
+        }
+        timing_logger.info(json.dumps(record), extra={"timing": record})
+
+
+class QueryProfilingMiddleware:
+    """
+    Counts the queries of every request, times them and finds the SQL it
+    repeats. A request is logged on core.queries when it runs more queries than
+    its route's QUERY_BUDGETS entry or SLOW_REQUEST_QUERY_COUNT, spends more
+    than SLOW_REQUEST_DB_SECONDS in the database, or repeats one SQL statement
+    DUPLICATE_QUERY_THRESHOLD times (usually a query in a loop). Queries a
+    streaming response runs while it is being sent are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        self.process_profile(request, response, profile)
+        return response
+
+    async def __acall__(self, request):
+        with profile_queries() as profile:
+            response = await self.get_response(request)
+        self.process_profile(request, response, profile)
+        return response
+
+    def process_profile(self, request, response, profile):
+        route = (
+            request.resolver_match.route
+            if request.resolver_match
+            else "unmatched"
+        )
+        budget = settings.QUERY_BUDGETS.get(route)
+        duplicates = profile.duplicates(settings.DUPLICATE_QUERY_THRESHOLD)
+        problems = []
+        if budget is not None and profile.count > budget:
+            problems.append("over_budget")
+        if profile.count > settings.SLOW_REQUEST_QUERY_COUNT:
+            problems.append("too_many_queries")
+        if profile.seconds > settings.SLOW_REQUEST_DB_SECONDS:
+            problems.append("slow_queries")
+        if len(duplicates) > 0:
+            problems.append("duplicated_queries")
+        if len(problems) == 0:
+            return
+
+        record = {
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "problems": problems,
+            "query_count": profile.count,
+            "query_budget": budget,
+            "db_ms": round(profile.seconds * 1000, 1),
+            "duplicated_sql": [
+                {"sql": sql[:300], "count": count}
+                for sql, count in duplicates[:5]
+            ],
+        }
+        queries_logger.warning(json.dumps(record), extra={"queries": record})
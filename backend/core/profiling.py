@@ -0,0 +1,105 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# QueryProfiles of the enclosing profile_queries blocks, so that a test's
+# profile still sees the queries of a request that QueryProfilingMiddleware
+# profiles too
+current_profiles = ContextVar("current_profiles", default=())
+
+# Transaction control statements repeat without being a query in a loop
+TRANSACTION_STATEMENTS = (
+    "BEGIN",
+    "COMMIT",
+    "ROLLBACK",
+    "SAVEPOINT",
+    "RELEASE SAVEPOINT",
+)
+
+
+class QueryProfile:
+    """
+    Every query run while a request is served, as (sql, seconds) pairs. The SQL
+    is recorded before its parameters are bound, so a query that runs once per
+    item of a loop shows up as the same SQL repeated.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def record(self, sql, seconds):
+        self.queries.append((sql, seconds))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(seconds for sql, seconds in self.queries)
+
+    def duplicates(self, min_count=2):
+        """
+        (sql, count) of the SQL run at least min_count times, most repeated
+        first
+        """
+        counts = Counter(
+            sql
+            for sql, seconds in self.queries
+            if not sql.startswith(TRANSACTION_STATEMENTS)
+        )
+        return [
+            (sql, count)
+            for sql, count in counts.most_common()
+            if count >= min_count
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    profiles = current_profiles.get()
+    if len(profiles) == 0:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        for profile in profiles:
+            profile.record(sql, seconds)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    Connections are per thread, so the recorder is added to every connection as
+    it is opened, which covers the sync_to_async threads of async views, and to
+    the current thread's connections for those opened before this module was
+    imported
+    """
+    if connection is None:
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection=connection)
+    elif record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+@contextmanager
+def profile_queries():
+    """
+    Records the queries run inside the block, including those of sync_to_async
+    calls, which copy the context
+    """
+    install_query_recorder()
+    profile = QueryProfile()
+    token = current_profiles.set(current_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        current_profiles.reset(token)
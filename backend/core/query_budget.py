@@ -0,0 +1,52 @@
+"""
+Test helper that fails a test when a Ninja route runs more queries than its
+QUERY_BUDGETS entry:
+
+    def test_search_query_budget(client):
+        with assert_query_budget("maps/api/search_for_restaurants"):
+            client.post(
+                "/maps/api/search_for_restaurants",
+                body,
+                content_type="application/json",
+            )
+
+Works with django.test.Client, ninja.testing.TestClient (which skips the
+middleware) and direct view calls.
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .profiling import profile_queries
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_query_budget(route, budget=None):
+    """
+    Raises QueryBudgetExceeded when the block runs more than budget queries,
+    QUERY_BUDGETS[route] by default, and lists the SQL the block repeated.
+    Yields the QueryProfile for finer assertions.
+    """
+    if budget is None:
+        if route not in settings.QUERY_BUDGETS:
+            raise KeyError(
+                f"{route} has no entry in QUERY_BUDGETS, pass a budget."
+            )
+        budget = settings.QUERY_BUDGETS[route]
+
+    with profile_queries() as profile:
+        yield profile
+
+    if profile.count > budget:
+        repeated = "".join(
+            f"\n  {count}x {sql}" for sql, count in profile.duplicates()
+        )
+        raise QueryBudgetExceeded(
+            f"{route} ran {profile.count} queries, its budget is {budget}."
+            + (f" Repeated SQL:{repeated}" if repeated else "")
+        )
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -55,6 +56,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that their totals cover every other middleware
+    "core.middleware.TimingMiddleware",
+    "core.middleware.QueryProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -177,3 +181,163 @@ EMAIL_HOST = "smtp.gmail.com"
 EMAIL_HOST_USER = os.getenv("ARJUN_EMAIL")
 EMAIL_HOST_PASSWORD = os.getenv("ARJUN_APP_PASSWORD")
 EMAIL_PORT = 587
+
+# Cuisine prediction
+CUISINE_MODEL_NAME = os.getenv("CUISINE_MODEL_NAME", "distiluse-base-multilingual-cased-v1")
+CUISINE_EMBEDDINGS_DIR = BASE_DIR / ".cache" / "cuisine_embeddings"
+# One of "torch", "torch-int8" or "onnx", see maps.cuisines.load_model
+CUISINE_INFERENCE_BACKEND = os.getenv("CUISINE_INFERENCE_BACKEND", "torch")
+# The model is loaded on the first prediction. Set this to load it while the app starts instead, so that the first
+# search does not pay for it.
+CUISINE_MODEL_WARMUP = os.getenv("CUISINE_MODEL_WARMUP", "False") == "True"
+# Unix socket of the shared inference worker (manage.py run_inference_worker). When empty, or when the worker is down,
+# every process predicts with its own copy of the model.
+CUISINE_INFERENCE_SOCKET = os.getenv("CUISINE_INFERENCE_SOCKET", "")
+CUISINE_INFERENCE_MAX_BATCH_SIZE = int(os.getenv("CUISINE_INFERENCE_MAX_BATCH_SIZE", "64"))
+CUISINE_INFERENCE_MAX_WAIT_MS = float(os.getenv("CUISINE_INFERENCE_MAX_WAIT_MS", "10"))
+
+# Google Maps
+# Place Details lookups for a search are fanned out over at most this many threads
+PLACES_DETAILS_MAX_WORKERS = int(os.getenv("PLACES_DETAILS_MAX_WORKERS", "8"))
+# Seconds a single Google Maps call (including its retries) may take before it is abandoned
+GOOGLE_MAPS_TIMEOUT = float(os.getenv("GOOGLE_MAPS_TIMEOUT", "5"))
+# "google" calls Google, "fake" replays GOOGLE_MAPS_FIXTURES offline (and makes up responses that were not recorded)
+# with GOOGLE_MAPS_FAKE_LATENCY_MS (+ up to GOOGLE_MAPS_FAKE_JITTER_MS) per call, "record" calls Google and records
+# every response into GOOGLE_MAPS_FIXTURES
+GOOGLE_MAPS_CLIENT = os.getenv("GOOGLE_MAPS_CLIENT", "google")
+GOOGLE_MAPS_FIXTURES = os.getenv("GOOGLE_MAPS_FIXTURES", str(BASE_DIR / "maps" / "google_maps_fixtures.json"))
+GOOGLE_MAPS_FAKE_LATENCY_MS = float(os.getenv("GOOGLE_MAPS_FAKE_LATENCY_MS", "100"))
+GOOGLE_MAPS_FAKE_JITTER_MS = float(os.getenv("GOOGLE_MAPS_FAKE_JITTER_MS", "50"))
+# Keep-alive connections kept open to Google per process
+GOOGLE_MAPS_POOL_SIZE = int(os.getenv("GOOGLE_MAPS_POOL_SIZE", "32"))
+# Calls per second (and burst size) every process allows itself, shared by all of its threads. Keep the sum over all
+# processes under the project's Google quota.
+GOOGLE_MAPS_QPS = int(os.getenv("GOOGLE_MAPS_QPS", "50"))
+GOOGLE_MAPS_BURST = int(os.getenv("GOOGLE_MAPS_BURST", "50"))
+# OVER_QUERY_LIMIT, 5xx, timeouts and connection errors are retried this many times with jittered exponential backoff
+GOOGLE_MAPS_MAX_RETRIES = 3
+GOOGLE_MAPS_RETRY_BASE_DELAY = 0.2
+GOOGLE_MAPS_RETRY_MAX_DELAY = 2
+# After this many calls in a row fail, Google is not called for GOOGLE_MAPS_BREAKER_RESET_TIMEOUT seconds and stale
+# cache entries are served instead
+GOOGLE_MAPS_BREAKER_FAILURE_THRESHOLD = 5
+GOOGLE_MAPS_BREAKER_RESET_TIMEOUT = 30
+# Seconds the last good copy of a Google response is kept for that purpose
+STALE_CACHE_TTL = 60 * 60 * 24 * 7
+# Google responses are cached in this cache alias. Point it at a shared backend (Redis, Memcached) to share the cache
+# between processes.
+PLACES_CACHE_ALIAS = "places"
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    PLACES_CACHE_ALIAS: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "places",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+# Seconds each group of Place Details fields stays cached
+PLACES_CACHE_TTLS = {
+    "static": 60 * 60 * 24 * 7,
+    "reviews": 60 * 60 * 6,
+    "hours": 60 * 15,
+}
+# Seconds before the name, address and maps URL stored on a Place are refreshed from Place Details
+PLACE_METADATA_TTL = 60 * 60 * 24 * 7
+# Seconds a geocoded location_name stays valid in the GeocodeResult table
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30
+# Text-search results are shared between searches whose location falls in the same geohash cell of this precision
+# (7 is a ~150m cell) and that use the same query, radius and types
+SEARCH_CACHE_GEOHASH_PRECISION = int(os.getenv("SEARCH_CACHE_GEOHASH_PRECISION", "7"))
+SEARCH_CACHE_TTL = 60 * 10
+# A next_page_token only becomes valid a couple of seconds after the page that returned it
+SEARCH_PAGE_TOKEN_DELAY = 2
+SEARCH_PAGE_TOKEN_RETRIES = 3
+# Seconds a client's geolocation and timezone are kept in its session by get_location
+GEOLOCATION_SESSION_TTL = 60 * 60
+# Without timezonefinder installed, Google's timezone answers are cached per cell of this many degrees (~10km)
+TIMEZONE_GRID_DEGREES = 0.1
+TIMEZONE_CACHE_TTL = 60 * 60 * 24 * 30
+# Text searches are answered from the places stored by earlier searches for the same query when every geohash cell of
+# this precision (6 is a ~1.2km x 0.6km cell) that the search circle overlaps was searched within LOCAL_SEARCH_TTL
+# seconds and at least LOCAL_SEARCH_MIN_RESULTS places match. Otherwise Google is asked and the cells are recorded.
+LOCAL_SEARCH_ENABLED = os.getenv("LOCAL_SEARCH_ENABLED", "True") == "True"
+LOCAL_SEARCH_GEOHASH_PRECISION = 6
+LOCAL_SEARCH_TTL = 60 * 60 * 24
+LOCAL_SEARCH_MIN_RESULTS = 5
+# Wider searches (a ~5km radius and up) bypass the local index: 20 hits say little about that many cells
+LOCAL_SEARCH_MAX_CELLS = 200
+
+# Semantic search
+# Searches store an embedding of every place they return, which /semantic_search ranks free-text queries against
+SEMANTIC_SEARCH_ENABLED = os.getenv("SEMANTIC_SEARCH_ENABLED", "True") == "True"
+# Seconds between checks for embeddings that other processes have stored
+SEMANTIC_INDEX_REFRESH_INTERVAL = 30
+SEMANTIC_SEARCH_MAX_RESULTS = 50
+
+# Instrumentation
+# Adds the time spent in each search stage to responses as a Server-Timing header. Turn it off when the timings
+# should not be visible to clients; they are still logged on core.timing.
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True") == "True"
+# Serves per-process stage, Google API and request latency histograms at /metrics in the Prometheus text format
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False") == "True"
+# Requests that run more queries, or spend more seconds in the database, than this are logged on core.queries
+SLOW_REQUEST_QUERY_COUNT = int(os.getenv("SLOW_REQUEST_QUERY_COUNT", "50"))
+SLOW_REQUEST_DB_SECONDS = float(os.getenv("SLOW_REQUEST_DB_SECONDS", "0.5"))
+# A request that runs the same SQL (with any parameters) this many times is logged as a likely query in a loop
+DUPLICATE_QUERY_THRESHOLD = int(os.getenv("DUPLICATE_QUERY_THRESHOLD", "5"))
+# Most queries each route may run, whatever the number of places involved. Requests over budget are logged, and
+# core.query_budget.assert_query_budget fails tests that go over it. A cold search (nothing geocoded, cached or
+# predicted yet) runs 27 queries on SQLite, transaction statements included. Adds are budgeted for a Place that is not
+# stored yet.
+QUERY_BUDGETS = {
+    "maps/api/get_location": 5,
+    "maps/api/async/get_location": 5,
+    "maps/api/search_for_restaurants": 30,
+    "maps/api/async/search_for_restaurants": 30,
+    "maps/api/paginated/search_for_restaurants": 30,
+    "maps/api/stream/search_for_restaurants": 30,
+    "maps/api/place_details": 30,
+    "maps/api/semantic_search": 5,
+    "users/api/get_favorite_places": 8,
+    "users/api/async/get_favorite_places": 8,
+    "users/api/add_favorite_place": 9,
+    "users/api/async/add_favorite_place": 9,
+    "users/api/remove_favorite_place": 6,
+    "users/api/async/remove_favorite_place": 6,
+    "users/api/get_reviews": 8,
+    "users/api/async/get_reviews": 8,
+    "users/api/add_review": 7,
+    "users/api/async/add_review": 7,
+}
+# core.timing logs one JSON line per instrumented request at INFO, core.queries the requests it flags at WARNING
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"message": {"format": "%(message)s"}},
+    "handlers": {"instrumentation": {"class": "logging.StreamHandler", "formatter": "message"}},
+    "loggers": {
+        "core.timing": {
+            "handlers": ["instrumentation"],
+            "level": os.getenv("TIMING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "core.queries": {
+            "handlers": ["instrumentation"],
+            "level": os.getenv("QUERIES_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# Tests
+# manage.py test runs against SQLite and the offline Google client, so it needs neither a database server nor an API
+# key
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+if TESTING:
+    DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "test.sqlite3"}}
+    # maps.0002 only applies on PostgreSQL, so the test database is created from the models instead
+    MIGRATION_MODULES = {"maps": None, "users": None}
+    GOOGLE_MAPS_CLIENT = "fake"
+    GOOGLE_MAPS_FIXTURES = ""
+    GOOGLE_MAPS_FAKE_LATENCY_MS = 0
+    GOOGLE_MAPS_FAKE_JITTER_MS = 0
@@ -0,0 +1,33 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from maps.gateway import cache
+from maps.tests.stubs import use_stub_model
+
+
+class TimingLogTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        cache.clear()
+        self.client.force_login(User.objects.create(username="timed"))
+
+    def test_instrumented_requests_are_logged_with_their_stages(self):
+        with self.assertLogs("core.timing", "INFO") as logs:
+            self.client.get(
+                "/maps/api/place_details",
+                {"place_id": "fake-33.774--84.3979-0"},
+            )
+
+        [record] = logs.records
+        self.assertEqual(json.loads(record.getMessage()), record.timing)
+        self.assertEqual(record.timing["method"], "GET")
+        self.assertEqual(record.timing["route"], "maps/api/place_details")
+        self.assertEqual(record.timing["status"], 200)
+        self.assertGreater(record.timing["duration_ms"], 0)
+        self.assertIn("place_details", record.timing["stages_ms"])
+
+    def test_uninstrumented_requests_are_not_logged(self):
+        with self.assertNoLogs("core.timing", "INFO"):
+            self.client.get("/users/api/get_favorite_places")
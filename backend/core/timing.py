@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .metrics import stage_seconds
+
+# (stage, seconds) pairs recorded while the current request is served, None
+# outside of TimingMiddleware
+current_spans = ContextVar("current_spans", default=None)
+
+
+@contextmanager
+def span(stage):
+    """
+    Times a named stage of the search pipeline into the search_stage_seconds
+    histogram and, while a request is being served, into its Server-Timing
+    header and timing log line. Works in async code and in sync_to_async
+    threads, which copy the request's context, but not in executor or
+    ThreadPoolExecutor threads.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stage_seconds.observe(seconds, stage=stage)
+        spans = current_spans.get()
+        if spans is not None:
+            spans.append((stage, seconds))
+
+
+def stage_totals(spans):
+    """
+    Seconds per stage in the order the stages first ran, summing stages that
+    ran more than once
+    """
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0) + seconds
+    return totals
+
+
+def server_timing_header(totals, total_seconds):
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.1f}"
+        for stage, seconds in [*totals.items(), ("total", total_seconds)]
+    )
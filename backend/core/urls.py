@@ -15,10 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 
+from .metrics import metrics
+
 urlpatterns = [
     path("", RedirectView.as_view(url="/dashboard/index/", permanent=True)),
     path("admin/", admin.site.urls),
@@ -31,3 +34,6 @@ urlpatterns = [
     path("users/", include("users.urls")),
     path("dashboard/", include("dashboard.urls")),
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path("metrics", metrics))
@@ -0,0 +1,25 @@
+import re
+from functools import lru_cache
+
+ADDRESS_PART_PATTERN = re.compile(r'<span class="([^"]+)">([^<]+)</span>')
+
+
+@lru_cache(maxsize=4096)
+def parse_address_parts(address_string):
+    return tuple(
+        (class_name.replace("-", "_"), content)
+        for class_name, content in ADDRESS_PART_PATTERN.findall(address_string)
+    )
+
+
+def parse_address(address_string):
+    """
+    Turns the adr_address microformat HTML returned by Place Details into a
+    dict such as {"street_address": ..., "locality": ..., "region": ...,
+    "postal_code": ..., "country_name": ...}
+
+    The same places come back search after search, so parsed addresses are
+    memoized on the raw string. Callers get a fresh dict each time and may
+    change it.
+    """
+    return dict(parse_address_parts(address_string))
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Place, PlaceReview
+from .models import GeocodeResult, Place, PlaceReview, SearchTile
 
 admin.site.register(Place)
 admin.site.register(PlaceReview)
+admin.site.register(GeocodeResult)
+admin.site.register(SearchTile)
@@ -1,48 +1,340 @@
+import asyncio
 import datetime
-import os
-import re
+import hashlib
+import json
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from http import HTTPStatus
+from typing import Optional
 
 import googlemaps
-import pytz
-import torch
+from asgiref.sync import sync_to_async
+from core.timing import span
+from django.conf import settings
+from django.db.models import Prefetch
 from django.http import HttpRequest
 from ninja import NinjaAPI
-from sentence_transformers import SentenceTransformer, util
-from users.models import UserProfile
+from users.models import FavoritePlace
 
-from .models import Place
-from .schemas import SearchParams
+from . import async_gateway
+from .address import parse_address
+from .cuisines import (
+    embed_and_predict_top_cuisines_batch,
+    embed_descriptions,
+    find_stale_cuisine_predictions,
+    save_cuisine_predictions,
+)
+from .gateway import fetch_place_details, geocode, get_place_details, gmaps, iter_place_details, text_search_page
+from .location import atimezone_id, get_zone, timezone_id
+from .models import Place, PlaceReview
+from .resilience import is_unavailable
+from .schemas import SearchParams, SemanticSearchParams
+from .semantic import find_stale_place_embeddings, place_embedding_index, save_place_embeddings
+from .streaming import STREAM_FORMATS, stream_events
 
 api = NinjaAPI(urls_namespace="maps")
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
-model = SentenceTransformer("distiluse-base-multilingual-cased-v1")
+SEARCH_TYPES = ["restaurant", "bakery", "cafe", "meal_delivery", "meal_takeaway"]
+LOCATION_SESSION_KEY = "maps_location"
 
 
-def predict_top_cuisines(description, cuisine_types, top_k=3):
-    description_embedding = model.encode(description, convert_to_tensor=True)
-    cuisine_embeddings = model.encode(cuisine_types, convert_to_tensor=True)
-    cosine_scores = util.cos_sim(description_embedding, cuisine_embeddings)[0]
-    top_results = torch.topk(cosine_scores, k=top_k)
-    top_cuisines = [cuisine_types[idx] for score, idx in zip(top_results.values, top_results.indices)]
-    return top_cuisines
+def build_location_response(location, timezone_id):
+    current_time = datetime.datetime.now(get_zone(timezone_id)).strftime("%H")
+    return {
+        "latitude": location["location"]["lat"],
+        "longitude": location["location"]["lng"],
+        "hour": int(current_time),
+    }
+
+
+def session_location(session_value):
+    """
+    Returns the (geolocation, timezone id) stored in a session by get_location, or None when there is none or it has
+    expired
+    """
+    if session_value is None or session_value["expires_at"] < time.time():
+        return None
+    return session_value["location"], session_value["timezone_id"]
+
+
+def session_location_value(location, timezone_id):
+    return {
+        "location": location,
+        "timezone_id": timezone_id,
+        "expires_at": time.time() + settings.GEOLOCATION_SESSION_TTL,
+    }
 
 
 @api.get("/get_location")
 def get_location(request: HttpRequest):
+    """
+    Geolocation is the only upstream call, made once per session every GEOLOCATION_SESSION_TTL seconds. The timezone
+    is resolved locally.
+    """
+    cached = session_location(request.session.get(LOCATION_SESSION_KEY))
+    if cached is not None:
+        return build_location_response(*cached)
+
     location = gmaps.geolocate()
-    timezone_id = gmaps.timezone(location=location["location"])["timeZoneId"]
-    timezone = pytz.timezone(timezone_id)
-    current_time = datetime.datetime.now(timezone).strftime("%H")
+    resolved_timezone_id = timezone_id(location["location"])
+    request.session[LOCATION_SESSION_KEY] = session_location_value(location, resolved_timezone_id)
+    return build_location_response(location, resolved_timezone_id)
+
+
+def build_search_query(params):
+    query = ""
+    if params.query == "cuisine_type":
+        query += f"Cuisine type: {params.cuisine_type}"
+    if params.query == "restaurant_name":
+        query += f"; Restaurant name: {params.restaurant_name}"
+    return query
+
+
+def filter_search_results(results, rating):
+    filtered_places = []
+    for place in results:
+        if place["business_status"] != "OPERATIONAL":
+            continue
+
+        if place.get("rating") and place.get("rating") < rating:
+            continue
+
+        filtered_places.append(place)
+    return filtered_places
+
+
+def place_description(place_result):
+    return place_result.get("editorial_summary")["overview"] if place_result.get("editorial_summary") else None
+
+
+def resolve_places(user, found_places):
+    """
+    ORM stage of a search. Takes (text-search hit, Place Details result) pairs and returns a
+    (hit, details, description, Place, created) tuple per place plus the ids of the places the user has favorited.
+    The details may be None when the caller did not need them.
+    """
+    place_models, created_google_place_ids = Place.objects.prefetch_related(
+        Prefetch("reviews_for_place", queryset=PlaceReview.objects.select_related("user"))
+    ).get_or_create_many([place["place_id"] for place, place_result in found_places])
+
+    favorite_place_ids = set(
+        FavoritePlace.objects.filter(user=user, place__in=place_models.values()).values_list("place_id", flat=True)
+    )
+
+    places = []
+    stale_place_models = []
+    stale_search_result_place_models = []
+    for place, place_result in found_places:
+        description = place_description(place_result) if place_result is not None else None
+        place_model = place_models[place["place_id"]]
+        created = place["place_id"] in created_google_place_ids
+        places.append((place, place_result, description, place_model, created))
+
+        # The details were fetched anyway, so the profile page's snapshot of this place is refreshed for free
+        if place_result is not None and place_model.is_metadata_stale():
+            place_model.update_metadata(place_result)
+            stale_place_models.append(place_model)
+        # Semantic search needs the location, rating and status of every place it indexes, with or without the local
+        # index recording them
+        if place_model.is_search_result_stale():
+            place_model.update_search_result(place)
+            stale_search_result_place_models.append(place_model)
+
+    if len(stale_place_models) > 0:
+        Place.objects.bulk_update(stale_place_models, Place.METADATA_FIELDS)
+    if len(stale_search_result_place_models) > 0:
+        Place.objects.bulk_update(stale_search_result_place_models, Place.SEARCH_RESULT_FIELDS)
+
+    return places, favorite_place_ids
+
+
+def cuisine_source_texts(places):
+    return [
+        (place_model, description if description else place["name"])
+        for place, place_result, description, place_model, created in places
+    ]
+
+
+def find_stale_inference(places_with_text):
+    """
+    (Place, source text) pairs whose cuisine prediction or semantic search embedding is stale. Both are saved for each
+    of them, since one forward pass gives both.
+    """
+    stale = find_stale_cuisine_predictions(places_with_text, top_k=2)
+    if settings.SEMANTIC_SEARCH_ENABLED:
+        stale_place_ids = {place.id for place, text in stale}
+        stale += [
+            (place, text)
+            for place, text in find_stale_place_embeddings(places_with_text)
+            if place.id not in stale_place_ids
+        ]
+    return stale
+
+
+def save_inference(stale, vectors, top_cuisine_types_per_place):
+    save_cuisine_predictions(stale, top_cuisine_types_per_place)
+    if settings.SEMANTIC_SEARCH_ENABLED:
+        save_place_embeddings(stale, vectors)
+
+
+def predicted_cuisines(places_with_text):
+    return [place_model.predicted_cuisines[:2] for place_model, text in places_with_text]
+
+
+def cuisines_for_places(places):
+    """
+    Top 2 cuisines of every resolved place. The semantic search index is kept up to date from the same forward pass,
+    so each stale place is encoded once.
+    """
+    places_with_text = cuisine_source_texts(places)
+    stale = find_stale_inference(places_with_text)
+    if len(stale) > 0:
+        with span("cuisine_inference"):
+            vectors, top_cuisine_types_per_place = embed_and_predict_top_cuisines_batch(
+                [text for place, text in stale], top_k=2
+            )
+        save_inference(stale, vectors, top_cuisine_types_per_place)
+    return predicted_cuisines(places_with_text)
+
+
+def build_place_summary(place):
+    """
+    Fields that come straight from the text-search hit, enough to put a marker on the map
+    """
     return {
-        "latitude": location["location"]["lat"],
-        "longitude": location["location"]["lng"],
-        "hour": int(current_time),
+        "place_id": place["place_id"],
+        "place_name": place["name"],
+        "location": {
+            "latitude": place["geometry"]["location"]["lat"],
+            "longitude": place["geometry"]["location"]["lng"],
+        },
+        "rating": place.get("rating"),
+        "is_open_now": (place.get("opening_hours").get("open_now") if place.get("opening_hours") else None),
     }
 
 
+def build_place_details(place_result, description):
+    """
+    Fields that need the Place Details result
+    """
+    return {
+        "contact_info": {
+            "address": parse_address(place_result["adr_address"]),
+            "phone_number": place_result.get("international_phone_number"),
+            "google_maps_page": place_result.get("url"),
+        },
+        "timings": (
+            place_result.get("opening_hours").get("periods") if place_result.get("opening_hours") else None
+        ),
+        "reviews": (
+            [
+                {
+                    "author_name": review["author_name"],
+                    "rating": review["rating"],
+                    "time": review["time"],
+                    "text": review["text"],
+                }
+                for review in place_result.get("reviews")
+            ]
+            if place_result.get("reviews")
+            else []
+        ),
+        "description": description,
+    }
+
+
+def build_place_enrichment(place_model, created, favorite_place_ids, description, top_cuisine_types):
+    """
+    Fields that need the database or the cuisine model
+    """
+    custom_place_reviews = []
+    if not created:
+        custom_place_reviews = place_model.reviews_for_place.all()
+
+    is_favorite_place = False
+    if not created:
+        is_favorite_place = place_model.id in favorite_place_ids
+
+    cuisine_type = ""
+    if description:
+        cuisine_type = ", ".join(top_cuisine_types)
+    else:
+        cuisine_type = "Our advanced prediction model predicts these cuisine types from the name of this restaurant: " + ", ".join(top_cuisine_types)
+
+    return {
+        "custom_reviews": [
+            {
+                "author_name": custom_review.user.username,
+                "rating": custom_review.rating,
+                "time": custom_review.timestamp,
+                "text": custom_review.text,
+            }
+            for custom_review in custom_place_reviews
+        ],
+        "is_favorite_place": is_favorite_place,
+        "cuisine_type": cuisine_type,
+    }
+
+
+def build_place_response(place, place_result, description, place_model, created, favorite_place_ids, top_cuisine_types):
+    return {
+        **build_place_summary(place),
+        **build_place_details(place_result, description),
+        **build_place_enrichment(place_model, created, favorite_place_ids, description, top_cuisine_types),
+    }
+
+
+def build_search_response(places, favorite_place_ids, top_cuisine_types_per_place):
+    return [
+        build_place_response(*place, favorite_place_ids, top_cuisine_types)
+        for place, top_cuisine_types in zip(places, top_cuisine_types_per_place)
+    ]
+
+
+def search_location(params, geocoded_location):
+    """
+    Where to search: the geocoded location name when there is one and Google found it, the given location otherwise
+    """
+    return geocoded_location if geocoded_location is not None else params.location
+
+
+def text_search_arguments(params, location):
+    return {
+        "location": location,
+        "query": build_search_query(params),
+        "radius": params.radius,
+        "types": SEARCH_TYPES,
+    }
+
+
+def pair_place_details(filtered_places, place_results):
+    """
+    (text-search hit, Place Details result) pairs, without the places whose details could not be fetched
+    """
+    return [
+        (place, place_result) for place, place_result in zip(filtered_places, place_results) if place_result is not None
+    ]
+
+
+def search_page(params, page=0):
+    """
+    Geocoding and text search, everything a search needs before the per-place lookups. Returns the raw text-search
+    result for the page-th page, or None when the search has fewer pages.
+    """
+    geocoded_location = None
+    if params.location_name != "":
+        with span("geocode"):
+            geocoded_location = geocode(params.location_name)
+
+    location = search_location(params, geocoded_location)
+    with span("text_search"):
+        return text_search_page(**text_search_arguments(params, location), page=page)
+
+
+def find_places(params):
+    return filter_search_results(search_page(params)["results"], params.rating)
+
+
 @api.post("/search_for_restaurants")
 def search_for_restaurants(request: HttpRequest, params: SearchParams):
     """
@@ -59,148 +351,346 @@ def search_for_restaurants(request: HttpRequest, params: SearchParams):
     if not request.user.is_authenticated:
         return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
 
-    response = []
+    filtered_places = find_places(params)
+    with span("place_details"):
+        place_results = fetch_place_details([place["place_id"] for place in filtered_places])
 
-    profile = UserProfile.objects.get(user=request.user)
-    favorite_google_place_ids = [favorite_place["google_place_id"] for favorite_place in profile.favorite_places]
+    with span("orm"):
+        places, favorite_place_ids = resolve_places(request.user, pair_place_details(filtered_places, place_results))
+    top_cuisine_types_per_place = cuisines_for_places(places)
 
-    query = ""
-    search_location = params.location
-    if params.location_name != "":
-        geocode_result = gmaps.geocode(address=params.location_name)
-        if len(geocode_result) > 0:
-            search_location = geocode_result[-0]["geometry"]["location"]
-    if params.query == "cuisine_type":
-        query += f"Cuisine type: {params.cuisine_type}"
-    if params.query == "restaurant_name":
-        query += f"; Restaurant name: {params.restaurant_name}"
+    with span("serialize"):
+        return build_search_response(places, favorite_place_ids, top_cuisine_types_per_place)
 
-    result = gmaps.places(
-        location=search_location,
-        query=query,
-        radius=params.radius,
-        type=["restaurant", "bakery", "cafe", "meal_delivery", "meal_takeaway"],
-    )
 
-    def parse_address(address_string):
-        pattern = r'<span class="([^"]+)">([^<]+)</span>'
-        matches = re.findall(pattern, address_string)
-        address_dict = {class_name.replace("-", "_"): content for class_name, content in matches}
-        return address_dict
+# Optional fields of a place in the paginated search and place_details responses. The summary fields (place_id,
+# place_name, location, rating, is_open_now) are always returned.
+PLACE_FIELDS = [
+    "contact_info",
+    "timings",
+    "reviews",
+    "description",
+    "custom_reviews",
+    "is_favorite_place",
+    "cuisine_type",
+]
+# Fields that need a Place Details lookup, cuisine_type because it is predicted from the editorial summary
+DETAILS_FIELDS = {"contact_info", "timings", "reviews", "description", "cuisine_type"}
+# Fields that need the database
+ENRICHMENT_FIELDS = {"custom_reviews", "is_favorite_place", "cuisine_type"}
 
-    for place in result["results"]:
-        if place["business_status"] != "OPERATIONAL":
-            continue
 
-        if place.get("rating") and place.get("rating") < params.rating:
-            continue
+def parse_fields(fields):
+    """
+    Turns a comma separated fields selector into a set, every optional field when it is empty
+    """
+    if not fields:
+        return set(PLACE_FIELDS)
 
-        place_result = gmaps.place(place_id=place["place_id"], reviews_sort="most_relevant")["result"]
-        place_model, created = Place.objects.get_or_create(google_place_id=place["place_id"])
-
-        custom_place_reviews = []
-        if not created:
-            custom_place_reviews = place_model.reviews_for_place.all()
-
-        is_favorite_place = False
-        if not created:
-            is_favorite_place = place["place_id"] in favorite_google_place_ids
-  
-        description = place_result.get("editorial_summary")["overview"] if place_result.get("editorial_summary") else None
-        cuisine_types = [
-            "Halal",
-            "Kosher",
-            "American Restaurant",
-            "Bakery",
-            "Bar",
-            "Barbecue Restaurant",
-            "Brazilian Food",
-            "Breakfast Food",
-            "Brunch Food",
-            "Cafe",
-            "Chinese Food",
-            "Coffee Shop",
-            "Fast Food Restaurant",
-            "French Food",
-            "Greek Food",
-            "Hamburger Food",
-            "Ice Cream Shop",
-            "Indian Food",
-            "Indonesian Food",
-            "Italian Food",
-            "Japanese Food",
-            "Korean Food",
-            "Lebanese Food",
-            "Meal Delivery",
-            "Meal Takeaway",
-            "Mediterranean Food",
-            "Mexican Food",
-            "Middle Eastern Food",
-            "Pizza Food",
-            "Ramen Food",
-            "Restaurant",
-            "Sandwich",
-            "Seafood Food",
-            "Spanish Food",
-            "Steak House",
-            "Sushi Food",
-            "Thai Food",
-            "Turkish Food",
-            "Vegan Food",
-            "Vegetarian Food",
-            "Vietnamese Food",
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(PLACE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Allowed fields: {', '.join(PLACE_FIELDS)}.")
+    return selected
+
+
+def enrich_places(user, filtered_places, fields):
+    """
+    Runs only the stages that the selected fields need, so a map view asking for the summary alone costs no Place
+    Details lookups, queries or inference
+    """
+    if fields & DETAILS_FIELDS:
+        with span("place_details"):
+            place_results = fetch_place_details([place["place_id"] for place in filtered_places])
+        found_places = pair_place_details(filtered_places, place_results)
+    else:
+        found_places = [(place, None) for place in filtered_places]
+
+    if not fields & ENRICHMENT_FIELDS:
+        return [
+            {**build_place_summary(place), **build_selected_details(place_result, fields)}
+            for place, place_result in found_places
         ]
-        top_cuisine_types = predict_top_cuisines(description if description else place["name"], cuisine_types, top_k=2)
 
-        cuisine_type = ""
-        if description:
-            cuisine_type = ", ".join(top_cuisine_types)
-        else:
-            cuisine_type = "Our advanced prediction model predicts these cuisine types from the name of this restaurant: " + ", ".join(top_cuisine_types)
-  
+    with span("orm"):
+        places, favorite_place_ids = resolve_places(user, found_places)
+    if "cuisine_type" in fields:
+        top_cuisine_types_per_place = cuisines_for_places(places)
+    else:
+        top_cuisine_types_per_place = [[] for _ in places]
+
+    responses = []
+    for (place, place_result, description, place_model, created), top_cuisine_types in zip(
+        places, top_cuisine_types_per_place
+    ):
+        enrichment = build_place_enrichment(place_model, created, favorite_place_ids, description, top_cuisine_types)
+        responses.append(
+            {
+                **build_place_summary(place),
+                **build_selected_details(place_result, fields),
+                **{field: value for field, value in enrichment.items() if field in fields},
+            }
+        )
+    return responses
+
+
+def build_selected_details(place_result, fields):
+    if place_result is None:
+        return {}
+    details = build_place_details(place_result, place_description(place_result))
+    return {field: value for field, value in details.items() if field in fields}
+
+
+def encode_search_cursor(params, page):
+    return urlsafe_b64encode(json.dumps({"search": search_digest(params), "page": page}).encode()).decode()
+
+
+def decode_search_cursor(params, cursor):
+    """
+    Returns the page a cursor points to. Raises ValueError when the cursor is malformed or belongs to another search.
+    """
+    try:
+        decoded = json.loads(urlsafe_b64decode(cursor.encode()))
+        search, page = decoded["search"], int(decoded["page"])
+    except (ValueError, TypeError, KeyError) as error:
+        # binascii.Error, UnicodeDecodeError and json.JSONDecodeError are ValueErrors too
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+    if search != search_digest(params):
+        raise ValueError("The cursor belongs to a different search.")
+    return page
+
+
+def search_digest(params):
+    return hashlib.sha256(json.dumps(params.dict(), sort_keys=True).encode()).hexdigest()[:16]
+
+
+@api.post("/paginated/search_for_restaurants")
+def search_for_restaurants_paginated(
+    request: HttpRequest,
+    params: SearchParams,
+    cursor: Optional[str] = None,
+    page: int = 0,
+    fields: Optional[str] = None,
+):
+    """
+    One page of search_for_restaurants, following Google's next_page_token (Google serves up to 3 pages of 20 results).
+    Pass the next_cursor of the previous response, or a 0-based page number. Only the requested page is enriched, and
+    fields is a comma separated subset of PLACE_FIELDS to return besides the summary, e.g. fields=cuisine_type for a
+    map view that loads the rest with place_details when a marker is opened.
+    """
+    if not request.user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    try:
+        if cursor:
+            page = decode_search_cursor(params, cursor)
+        selected_fields = parse_fields(fields)
+    except ValueError as error:
+        return {"status": HTTPStatus.BAD_REQUEST, "msg": str(error)}
+
+    try:
+        result = search_page(params, page) if page >= 0 else None
+    except googlemaps.exceptions.ApiError as error:
+        # Google refuses a next_page_token with INVALID_REQUEST once it has expired, after a few minutes
+        if page == 0 or error.status != "INVALID_REQUEST":
+            raise
+        return {"status": HTTPStatus.GONE, "msg": "Search cursor expired"}
+    if result is None:
+        return {"status": HTTPStatus.OK, "page": page, "places": [], "next_cursor": None}
+
+    places = enrich_places(request.user, filter_search_results(result["results"], params.rating), selected_fields)
+    return {
+        "status": HTTPStatus.OK,
+        "page": page,
+        "places": places,
+        "next_cursor": encode_search_cursor(params, page + 1) if result.get("next_page_token") else None,
+    }
+
+
+@api.get("/place_details")
+def place_details(request: HttpRequest, place_id: str, fields: Optional[str] = None):
+    """
+    Everything about a single place, for a marker that was loaded without some of its fields
+    """
+    if not request.user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as error:
+        return {"status": HTTPStatus.BAD_REQUEST, "msg": str(error)}
 
-        response.append({
+    try:
+        # Place Details results have the same shape as text-search hits, and enrich_places finds them in the cache
+        with span("place_details"):
+            place_result = get_place_details(place_id)
+    except Exception as error:
+        # Google down (circuit open, quota exhausted, 5xx, timeouts) with no stale copy to serve
+        if is_unavailable(error):
+            return {"status": HTTPStatus.SERVICE_UNAVAILABLE, "msg": f"Details for place {place_id} are unavailable."}
+        if isinstance(error, googlemaps.exceptions.ApiError):
+            return {"status": HTTPStatus.NOT_FOUND, "msg": f"Place {place_id} could not be found: {error}"}
+        raise
+
+    places = enrich_places(request.user, [place_result], selected_fields)
+    if len(places) == 0:
+        return {"status": HTTPStatus.SERVICE_UNAVAILABLE, "msg": f"Details for place {place_id} are unavailable."}
+    return {"status": HTTPStatus.OK, "place": places[0]}
+
+
+def search_events(user, filtered_places):
+    """
+    Markers first, then each place's details as soon as its lookup returns, then the database and cuisine fields
+    for every place once they have been resolved in one batch
+    """
+    for place in filtered_places:
+        yield "place", build_place_summary(place)
+
+    found_places = [None] * len(filtered_places)
+    for index, place_result in iter_place_details([place["place_id"] for place in filtered_places]):
+        place = filtered_places[index]
+        if place_result is None:
+            yield "dropped", {"place_id": place["place_id"]}
+            continue
+
+        found_places[index] = (place, place_result)
+        yield "details", {
+            "place_id": place["place_id"],
+            **build_place_details(place_result, place_description(place_result)),
+        }
+
+    with span("orm"):
+        places, favorite_place_ids = resolve_places(
+            user, [found_place for found_place in found_places if found_place]
+        )
+    top_cuisine_types_per_place = cuisines_for_places(places)
+    for (place, place_result, description, place_model, created), top_cuisine_types in zip(
+        places, top_cuisine_types_per_place
+    ):
+        yield "enrichment", {
             "place_id": place["place_id"],
-            "place_name": place["name"],
+            **build_place_enrichment(place_model, created, favorite_place_ids, description, top_cuisine_types),
+        }
+
+    yield "done", {"count": len(places)}
+
+
+@api.post("/stream/search_for_restaurants")
+def search_for_restaurants_stream(request: HttpRequest, params: SearchParams, stream_format: str = "ndjson"):
+    """
+    Streaming version of search_for_restaurants. stream_format is "ndjson" or "sse". Every message is a "place",
+    "details", "dropped", "enrichment" or "done" event, and all but the last carry the place_id they belong to, so
+    merging the place, details and enrichment data of a place gives the same object search_for_restaurants returns.
+    """
+    if not request.user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    if stream_format not in STREAM_FORMATS:
+        return {"status": HTTPStatus.BAD_REQUEST, "msg": f"stream_format must be one of {', '.join(STREAM_FORMATS)}."}
+
+    # Runs before the response starts so that a failed search is still reported as a regular error
+    filtered_places = find_places(params)
+    return stream_events(request, stream_format, search_events(request.user, filtered_places))
+
+
+@api.post("/semantic_search")
+def semantic_search(request: HttpRequest, params: SemanticSearchParams):
+    """
+    Free-text search such as "quiet spot for ramen late night" over every place earlier searches have stored, ranked
+    by how close its description is to the query. Answered without calling Google.
+
+    Example request body:
+
+    {
+        "query": "quiet spot for ramen late night",
+        "location": {"lat": 33.7756, "lng": -84.3963},
+        "radius": 2000,
+        "rating": 4.0
+    }
+    """
+    if not request.user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    with span("embed_query"):
+        query_embedding = embed_descriptions([params.query])[0]
+    with span("vector_search"):
+        matches = place_embedding_index.search(
+            query_embedding,
+            params.location,
+            params.radius,
+            params.rating,
+            max(1, min(params.limit, settings.SEMANTIC_SEARCH_MAX_RESULTS)),
+        )
+    with span("orm"):
+        place_models = Place.objects.in_bulk([place_id for place_id, score in matches])
+    return [
+        {
+            **build_place_summary(place_models[place_id].to_search_result()),
             "contact_info": {
-                "address": parse_address(place_result["adr_address"]),
-                "phone_number": place_result.get("international_phone_number"),
-                "google_maps_page": place_result.get("url"),
+                "address": place_models[place_id].address,
+                "google_maps_page": place_models[place_id].google_maps_url,
             },
-            "location": {
-                "latitude": place["geometry"]["location"]["lat"],
-                "longitude": place["geometry"]["location"]["lng"],
-            },
-            "rating": place.get("rating"),
-            "is_open_now": (place.get("opening_hours").get("open_now") if place.get("opening_hours") else None),
-            "timings": (
-                place_result.get("opening_hours").get("periods") if place_result.get("opening_hours") else None
-            ),
-            "reviews": (
-                [
-                    {
-                        "author_name": review["author_name"],
-                        "rating": review["rating"],
-                        "time": review["time"],
-                        "text": review["text"],
-                    }
-                    for review in place_result.get("reviews")
-                ]
-                if place_result.get("reviews")
-                else []
-            ),
-            "custom_reviews": [
-                {
-                    "author_name": custom_review.user.username,
-                    "rating": custom_review.rating,
-                    "time": custom_review.timestamp,
-                    "text": custom_review.text,
-                }
-                for custom_review in custom_place_reviews
-            ],
-            "is_favorite_place": is_favorite_place,
-            "description": description,
-            "cuisine_type": cuisine_type,
-        })
-
-    return response
+            "cuisine_type": ", ".join(place_models[place_id].predicted_cuisines[:2]),
+            "similarity": score,
+        }
+        for place_id, score in matches
+        if place_id in place_models
+    ]
+
+
+@api.get("/async/get_location")
+@async_gateway.with_client
+async def get_location_async(request: HttpRequest):
+    cached = session_location(await request.session.aget(LOCATION_SESSION_KEY))
+    if cached is not None:
+        return build_location_response(*cached)
+
+    location = await async_gateway.geolocate()
+    resolved_timezone_id = await atimezone_id(location["location"])
+    await request.session.aset(LOCATION_SESSION_KEY, session_location_value(location, resolved_timezone_id))
+    return build_location_response(location, resolved_timezone_id)
+
+
+@api.post("/async/search_for_restaurants")
+@async_gateway.with_client
+async def search_for_restaurants_async(request: HttpRequest, params: SearchParams):
+    """
+    Same as search_for_restaurants, but Google calls are awaited instead of holding a worker thread, ORM work runs
+    through sync_to_async and model inference runs in the default executor
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    geocoded_location = None
+    if params.location_name != "":
+        with span("geocode"):
+            geocoded_location = await async_gateway.geocode(params.location_name)
+
+    location = search_location(params, geocoded_location)
+    with span("text_search"):
+        result = await async_gateway.text_search(**text_search_arguments(params, location))
+    filtered_places = filter_search_results(result["results"], params.rating)
+
+    with span("place_details"):
+        place_results = await async_gateway.fetch_place_details([place["place_id"] for place in filtered_places])
+
+    with span("orm"):
+        places, favorite_place_ids = await sync_to_async(resolve_places)(
+            user, pair_place_details(filtered_places, place_results)
+        )
+
+    places_with_text = cuisine_source_texts(places)
+    stale = await sync_to_async(find_stale_inference)(places_with_text)
+    if len(stale) > 0:
+        with span("cuisine_inference"):
+            vectors, top_cuisine_types_per_place = await asyncio.get_running_loop().run_in_executor(
+                None,
+                embed_and_predict_top_cuisines_batch,
+                [text for place, text in stale],
+                2,
+            )
+        await sync_to_async(save_inference)(stale, vectors, top_cuisine_types_per_place)
+
+    with span("serialize"):
+        return build_search_response(places, favorite_place_ids, predicted_cuisines(places_with_text))
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MapsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "maps"
+
+    def ready(self):
+        if settings.CUISINE_MODEL_WARMUP:
+            from .cuisines import get_model
+
+            get_model()
@@ -0,0 +1,381 @@
+import asyncio
+import logging
+import time
+import weakref
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import wraps
+
+import googlemaps
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+
+from .gateway import (
+    GOOGLE_API_KEY,
+    cache,
+    cache_stats,
+    gmaps,
+    normalize_address,
+    place_details_cache_key,
+    search_query_digest,
+    split_place_details,
+    stale_cache_key,
+    text_search_cache_key,
+)
+from .local_index import local_text_search, record_text_search
+from .resilience import acall_google, is_unavailable
+from .models import GeocodeResult
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_MAPS_BASE_URL = "https://maps.googleapis.com"
+GEOLOCATION_URL = "https://www.googleapis.com/geolocation/v1/geolocate"
+# The googlemaps.Client method behind each web service, so that sync and async
+# calls share their api metric label
+API_NAMES = {
+    "/maps/api/place/details/json": "place",
+    "/maps/api/place/textsearch/json": "places",
+    "/maps/api/geocode/json": "geocode",
+    "/maps/api/timezone/json": "timezone",
+}
+
+# The async counterpart of gateway.gmaps. It talks to the same Google web
+# services and shares the gateway's cache and counters. httpx clients are bound
+# to the event loop they were created in. Under ASGI the server's loop lives as
+# long as the process, so every request shares that loop's client and its
+# keep-alive connections. Under WSGI every async view runs in a loop of its
+# own, so views decorated with with_client get a client of their own that is
+# closed when they return.
+clients = weakref.WeakKeyDictionary()
+request_clients = ContextVar("request_clients", default=None)
+
+
+def build_client():
+    return httpx.AsyncClient(
+        timeout=settings.GOOGLE_MAPS_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.GOOGLE_MAPS_POOL_SIZE,
+            max_keepalive_connections=settings.GOOGLE_MAPS_POOL_SIZE,
+        ),
+    )
+
+
+def get_client():
+    request_client = request_clients.get()
+    if request_client is not None:
+        # Created on first use, so cached answers never build one
+        if len(request_client) == 0:
+            request_client.append(build_client())
+        return request_client[0]
+
+    loop = asyncio.get_running_loop()
+    if loop not in clients:
+        clients[loop] = build_client()
+    return clients[loop]
+
+
+def with_client(view):
+    """
+    Decorates an async view that calls Google. Outside of ASGI the view's
+    requests use a client of their own, closed when the view returns, instead
+    of leaking one client per request.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if isinstance(request, ASGIRequest):
+            return await view(request, *args, **kwargs)
+
+        request_client = []
+        token = request_clients.set(request_client)
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            request_clients.reset(token)
+            for client in request_client:
+                await client.aclose()
+
+    return wrapper
+
+
+class AsyncSingleFlight:
+    """
+    Same as gateway.SingleFlight for coroutines: concurrent awaits of the same
+    key in one event loop share a single call
+    """
+
+    def __init__(self):
+        self.calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, coroutine_function):
+        calls = self.calls.setdefault(asyncio.get_running_loop(), {})
+        call = calls.get(key)
+        if call is None:
+            call = calls[key] = asyncio.ensure_future(coroutine_function())
+            call.add_done_callback(lambda call: calls.pop(key, None))
+        return await asyncio.shield(call)
+
+
+geocode_flight = AsyncSingleFlight()
+text_search_flight = AsyncSingleFlight()
+
+
+async def request(path, params):
+    """
+    GET one of the Maps web services and raise the same googlemaps exceptions
+    as the sync client on failure. Goes through the same rate limiter, retry
+    policy and circuit breaker as gateway.gmaps.
+    """
+    return await acall_google(API_NAMES[path], send_request, path, params)
+
+
+async def send_request(path, params):
+    if hasattr(gmaps.client, "arequest"):
+        return await gmaps.client.arequest(path, params)
+
+    try:
+        response = await get_client().get(
+            f"{GOOGLE_MAPS_BASE_URL}{path}",
+            params={**params, "key": GOOGLE_API_KEY},
+        )
+    except httpx.TimeoutException as error:
+        raise googlemaps.exceptions.Timeout() from error
+    except httpx.HTTPError as error:
+        raise googlemaps.exceptions.TransportError(error) from error
+
+    if response.status_code != 200:
+        raise googlemaps.exceptions.HTTPError(response.status_code)
+
+    body = response.json()
+    if body["status"] not in ("OK", "ZERO_RESULTS"):
+        raise googlemaps.exceptions.ApiError(
+            body["status"], body.get("error_message")
+        )
+    return body
+
+
+async def with_stale_fallback(key, coroutine_function):
+    """
+    Async version of gateway.with_stale_fallback, sharing its stale entries
+    """
+    try:
+        value = await coroutine_function()
+    except Exception as error:
+        if not is_unavailable(error):
+            raise
+        value = (await cache.aget_many([stale_cache_key(key)])).get(
+            stale_cache_key(key)
+        )
+        cache_stats.record("stale", hit=value is not None)
+        if value is None:
+            raise
+        logger.warning(
+            "Google Maps is unavailable (%s), serving a stale copy of %s",
+            error,
+            key,
+        )
+        return value
+
+    await cache.aset(stale_cache_key(key), value, settings.STALE_CACHE_TTL)
+    return value
+
+
+async def geolocate():
+    return await acall_google("geolocate", send_geolocate)
+
+
+async def send_geolocate():
+    if hasattr(gmaps.client, "ageolocate"):
+        return await gmaps.client.ageolocate()
+
+    try:
+        response = await get_client().post(
+            GEOLOCATION_URL, params={"key": GOOGLE_API_KEY}, json={}
+        )
+    except httpx.TimeoutException as error:
+        raise googlemaps.exceptions.Timeout() from error
+    except httpx.HTTPError as error:
+        raise googlemaps.exceptions.TransportError(error) from error
+
+    if response.status_code >= 500:
+        raise googlemaps.exceptions.HTTPError(response.status_code)
+
+    body = response.json()
+    if response.status_code != 200:
+        error = body.get("error", {})
+        raise googlemaps.exceptions.ApiError(
+            response.status_code, error.get("message")
+        )
+    return body
+
+
+async def timezone_id(location):
+    body = await request(
+        "/maps/api/timezone/json",
+        {
+            "location": f"{location['lat']},{location['lng']}",
+            "timestamp": int(time.time()),
+        },
+    )
+    return body["timeZoneId"]
+
+
+async def get_place_details(place_id):
+    keys = {
+        group: place_details_cache_key(place_id, group)
+        for group in settings.PLACES_CACHE_TTLS
+    }
+    cached = await cache.aget_many(list(keys.values()))
+    if len(cached) == len(keys):
+        cache_stats.record("place_details", hit=True)
+        place_result = {}
+        for key in keys.values():
+            place_result.update(cached[key])
+        return place_result
+
+    cache_stats.record("place_details", hit=False)
+
+    async def fetch():
+        body = await request(
+            "/maps/api/place/details/json",
+            {"place_id": place_id, "reviews_sort": "most_relevant"},
+        )
+        return body["result"]
+
+    place_result = await with_stale_fallback(
+        place_details_cache_key(place_id, "all"), fetch
+    )
+    for group, fields in split_place_details(place_result).items():
+        await cache.aset(
+            keys[group], fields, settings.PLACES_CACHE_TTLS[group]
+        )
+    return place_result
+
+
+async def fetch_place_details(place_ids):
+    """
+    Async version of gateway.fetch_place_details, with at most
+    PLACES_DETAILS_MAX_WORKERS lookups in flight
+    """
+    semaphore = asyncio.Semaphore(settings.PLACES_DETAILS_MAX_WORKERS)
+
+    async def get_place_details_or_none(place_id):
+        async with semaphore:
+            try:
+                return await get_place_details(place_id)
+            except Exception as error:
+                if not is_unavailable(error):
+                    raise
+                logger.warning(
+                    "Place Details lookup for %s failed (%s), dropping it from the results",
+                    place_id,
+                    error,
+                )
+                return None
+
+    return await asyncio.gather(
+        *[get_place_details_or_none(place_id) for place_id in place_ids]
+    )
+
+
+async def geocode(address):
+    normalized_address = normalize_address(address)
+    return await geocode_flight.do(
+        normalized_address,
+        lambda: geocode_normalized_address(normalized_address),
+    )
+
+
+async def geocode_normalized_address(normalized_address):
+    cutoff = timezone.now() - timedelta(seconds=settings.GEOCODE_CACHE_TTL)
+    geocode_result = await GeocodeResult.objects.filter(
+        normalized_address=normalized_address, updated_at__gte=cutoff
+    ).afirst()
+    if geocode_result is not None:
+        cache_stats.record("geocode", hit=True)
+    else:
+        cache_stats.record("geocode", hit=False)
+        try:
+            results = (
+                await request(
+                    "/maps/api/geocode/json", {"address": normalized_address}
+                )
+            )["results"]
+        except Exception as error:
+            geocode_result = await GeocodeResult.objects.filter(
+                normalized_address=normalized_address
+            ).afirst()
+            if not is_unavailable(error) or geocode_result is None:
+                raise
+            logger.warning(
+                "Google Maps is unavailable (%s), using a stale geocode of %s",
+                error,
+                normalized_address,
+            )
+        else:
+            location = (
+                results[0]["geometry"]["location"]
+                if len(results) > 0
+                else {"lat": None, "lng": None}
+            )
+            geocode_result, created = (
+                await GeocodeResult.objects.aupdate_or_create(
+                    normalized_address=normalized_address,
+                    defaults={
+                        "latitude": location["lat"],
+                        "longitude": location["lng"],
+                    },
+                )
+            )
+
+    if geocode_result.latitude is None:
+        return None
+    return {"lat": geocode_result.latitude, "lng": geocode_result.longitude}
+
+
+async def text_search(location, query, radius, types):
+    key = text_search_cache_key(location, query, radius, types)
+
+    async def search():
+        cached = await cache.aget_many([key])
+        if key in cached:
+            cache_stats.record("text_search", hit=True)
+            return cached[key]
+
+        cache_stats.record("text_search", hit=False)
+        query_digest = search_query_digest(query, types)
+        result = None
+        if settings.LOCAL_SEARCH_ENABLED:
+            result = await sync_to_async(local_text_search)(
+                location, query_digest, radius
+            )
+            cache_stats.record("local_search", hit=result is not None)
+        if result is not None:
+            await cache.aset(key, result, settings.SEARCH_CACHE_TTL)
+            return result
+
+        result = await with_stale_fallback(
+            key,
+            lambda: request(
+                "/maps/api/place/textsearch/json",
+                {
+                    "query": query,
+                    "location": f"{location['lat']},{location['lng']}",
+                    "radius": radius,
+                    "type": types,
+                    "minprice": 0,
+                    "maxprice": 4,
+                },
+            ),
+        )
+        if settings.LOCAL_SEARCH_ENABLED:
+            await sync_to_async(record_text_search)(
+                location, query_digest, radius, result["results"]
+            )
+        await cache.aset(key, result, settings.SEARCH_CACHE_TTL)
+        return result
+
+    return await text_search_flight.do(key, search)
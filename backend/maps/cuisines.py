@@ -0,0 +1,304 @@
+import hashlib
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .inference import inference_client
+from .models import Place
+
+CUISINE_TYPES = [
+    "Halal",
+    "Kosher",
+    "American Restaurant",
+    "Bakery",
+    "Bar",
+    "Barbecue Restaurant",
+    "Brazilian Food",
+    "Breakfast Food",
+    "Brunch Food",
+    "Cafe",
+    "Chinese Food",
+    "Coffee Shop",
+    "Fast Food Restaurant",
+    "French Food",
+    "Greek Food",
+    "Hamburger Food",
+    "Ice Cream Shop",
+    "Indian Food",
+    "Indonesian Food",
+    "Italian Food",
+    "Japanese Food",
+    "Korean Food",
+    "Lebanese Food",
+    "Meal Delivery",
+    "Meal Takeaway",
+    "Mediterranean Food",
+    "Mexican Food",
+    "Middle Eastern Food",
+    "Pizza Food",
+    "Ramen Food",
+    "Restaurant",
+    "Sandwich",
+    "Seafood Food",
+    "Spanish Food",
+    "Steak House",
+    "Sushi Food",
+    "Thai Food",
+    "Turkish Food",
+    "Vegan Food",
+    "Vegetarian Food",
+    "Vietnamese Food",
+]
+
+# torch and sentence_transformers take seconds and hundreds of MB to import, so
+# they are only loaded the first time a prediction is needed (or at startup
+# when CUISINE_MODEL_WARMUP is set) rather than whenever this module is
+# imported
+model = None
+cuisine_embeddings = None
+model_lock = threading.Lock()
+
+INFERENCE_BACKENDS = ["torch", "torch-int8", "onnx"]
+
+
+def cuisine_types_hash(cuisine_types=CUISINE_TYPES):
+    return hashlib.sha256("\n".join(cuisine_types).encode()).hexdigest()[:16]
+
+
+def cuisine_embeddings_path():
+    """
+    The artifact is keyed on the model name, the inference backend and the
+    label list so that changing any of them forces a re-encode
+    """
+    model_name = settings.CUISINE_MODEL_NAME.replace("/", "--")
+    return (
+        Path(settings.CUISINE_EMBEDDINGS_DIR)
+        / f"{model_name}-{settings.CUISINE_INFERENCE_BACKEND}-{cuisine_types_hash()}.pt"
+    )
+
+
+def load_model(backend):
+    """
+    Builds the SentenceTransformer for one of the INFERENCE_BACKENDS:
+
+    - "torch": full precision torch, the reference implementation
+    - "torch-int8": the same model with every Linear layer dynamically
+      quantized to int8, CPU only
+    - "onnx": the transformer exported to and run by ONNX Runtime, needs
+      `pip install optimum[onnxruntime]`
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(settings.CUISINE_MODEL_NAME)
+
+    if backend == "torch-int8":
+        import torch
+
+        return torch.ao.quantization.quantize_dynamic(
+            SentenceTransformer(settings.CUISINE_MODEL_NAME, device="cpu"),
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+        )
+
+    if backend == "onnx":
+        try:
+            return SentenceTransformer(
+                settings.CUISINE_MODEL_NAME, device="cpu", backend="onnx"
+            )
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                "The onnx cuisine inference backend needs optimum and onnxruntime: pip install optimum[onnxruntime]"
+            ) from error
+
+    raise ImproperlyConfigured(
+        f"Unknown CUISINE_INFERENCE_BACKEND '{backend}', expected one of {', '.join(INFERENCE_BACKENDS)}"
+    )
+
+
+def load_cuisine_embeddings(model):
+    import torch
+
+    path = cuisine_embeddings_path()
+    if path.exists():
+        return torch.load(path, map_location=model.device)
+
+    cuisine_embeddings = model.encode(
+        CUISINE_TYPES, convert_to_tensor=True, normalize_embeddings=True
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(cuisine_embeddings.cpu(), path)
+    return cuisine_embeddings
+
+
+def get_model():
+    """
+    Returns the SentenceTransformer and the normalized cuisine label
+    embeddings, loading both on first use
+    """
+    global model, cuisine_embeddings
+
+    with model_lock:
+        if model is None:
+            loaded_model = load_model(settings.CUISINE_INFERENCE_BACKEND)
+            cuisine_embeddings = load_cuisine_embeddings(loaded_model)
+            model = loaded_model
+
+    return model, cuisine_embeddings
+
+
+def predict_top_cuisines(description, top_k=3):
+    return predict_top_cuisines_batch([description], top_k=top_k)[0]
+
+
+def predict_top_cuisines_batch(descriptions, top_k=3):
+    """
+    Predicts through the shared inference worker when CUISINE_INFERENCE_SOCKET
+    is set, and in this process when it is not set or the worker is down
+    """
+    if len(descriptions) == 0:
+        return []
+
+    if inference_client is not None:
+        top_cuisine_types_per_description = (
+            inference_client.predict_top_cuisines_batch(descriptions, top_k)
+        )
+        if top_cuisine_types_per_description is not None:
+            return top_cuisine_types_per_description
+
+    return predict_top_cuisines_batch_local(descriptions, top_k=top_k)
+
+
+def predict_top_cuisines_batch_local(descriptions, top_k=3):
+    """
+    Encodes every description in a single forward pass and ranks all of them
+    against the cuisine labels at once
+    """
+    if len(descriptions) == 0:
+        return []
+
+    return top_cuisines_from_embeddings(
+        encode_descriptions_local(descriptions), top_k=top_k
+    )
+
+
+def encode_descriptions_local(descriptions):
+    model, cuisine_embeddings = get_model()
+    return model.encode(
+        descriptions, convert_to_tensor=True, normalize_embeddings=True
+    )
+
+
+def top_cuisines_from_embeddings(description_embeddings, top_k=3):
+    model, cuisine_embeddings = get_model()
+    cosine_scores = description_embeddings @ cuisine_embeddings.T
+    top_results = cosine_scores.topk(k=top_k, dim=1)
+    return [
+        [CUISINE_TYPES[idx] for idx in indices]
+        for indices in top_results.indices.tolist()
+    ]
+
+
+def embed_descriptions(descriptions):
+    """
+    Normalized sentence embeddings of the descriptions as a float32 numpy
+    array, from the shared inference worker when it is available and from this
+    process otherwise
+    """
+    if len(descriptions) == 0:
+        return None
+
+    if inference_client is not None:
+        embeddings = inference_client.embed_descriptions(descriptions)
+        if embeddings is not None:
+            return embeddings
+
+    return (
+        encode_descriptions_local(descriptions).cpu().numpy().astype("float32")
+    )
+
+
+def embed_and_predict_top_cuisines_batch(descriptions, top_k=3):
+    """
+    embed_descriptions and predict_top_cuisines_batch from a single forward
+    pass, for places that need both
+    """
+    if len(descriptions) == 0:
+        return None, []
+
+    if inference_client is not None:
+        result = inference_client.embed_and_predict_top_cuisines_batch(
+            descriptions, top_k
+        )
+        if result is not None:
+            return result
+
+    embeddings = encode_descriptions_local(descriptions)
+    return embeddings.cpu().numpy().astype(
+        "float32"
+    ), top_cuisines_from_embeddings(embeddings, top_k=top_k)
+
+
+def embedding_model_version():
+    return (
+        f"{settings.CUISINE_MODEL_NAME}:{settings.CUISINE_INFERENCE_BACKEND}"
+    )
+
+
+def cuisine_model_version():
+    return f"{settings.CUISINE_MODEL_NAME}:{settings.CUISINE_INFERENCE_BACKEND}:{cuisine_types_hash()}"
+
+
+def source_text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def find_stale_cuisine_predictions(places_with_text, top_k=2):
+    """
+    Takes (Place, source text) pairs and returns the (Place, source text) pairs
+    whose stored predictions were made from a different text or by a different
+    model version
+    """
+    model_version = cuisine_model_version()
+    return [
+        (place, text)
+        for place, text in places_with_text
+        if place.cuisine_model_version != model_version
+        or place.cuisine_source_hash != source_text_hash(text)
+        or len(place.predicted_cuisines) < top_k
+    ]
+
+
+def save_cuisine_predictions(places_with_text, top_cuisine_types_per_place):
+    model_version = cuisine_model_version()
+    for (place, text), top_cuisine_types in zip(
+        places_with_text, top_cuisine_types_per_place
+    ):
+        place.predicted_cuisines = top_cuisine_types
+        place.cuisine_model_version = model_version
+        place.cuisine_source_hash = source_text_hash(text)
+    Place.objects.bulk_update(
+        [place for place, text in places_with_text],
+        ["predicted_cuisines", "cuisine_model_version", "cuisine_source_hash"],
+    )
+
+
+def predict_cached_cuisines(places_with_text, top_k=2):
+    """
+    Reuses the predictions stored on each Place and only runs inference, in one
+    batch, for the stale ones
+    """
+    stale = find_stale_cuisine_predictions(places_with_text, top_k=top_k)
+    if len(stale) > 0:
+        save_cuisine_predictions(
+            stale,
+            predict_top_cuisines_batch(
+                [text for place, text in stale], top_k=top_k
+            ),
+        )
+
+    return [
+        place.predicted_cuisines[:top_k] for place, text in places_with_text
+    ]
@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+CUISINE_DESCRIPTIONS = [
+    (
+        "Trattoria",
+        "Family-run trattoria serving handmade pasta and wood-fired pizza",
+    ),
+    ("Ramen Bar", "Late-night noodle bar with rich tonkotsu broth"),
+    ("Diner", "Classic diner with pancakes, eggs and bottomless coffee"),
+    ("Taqueria", "Street tacos, burritos and fresh salsa"),
+    (
+        "Steakhouse",
+        "Upscale steakhouse with dry-aged cuts and an extensive wine list",
+    ),
+    ("Green Bowl", "Plant-based bowls, smoothies and salads"),
+    ("Dim Sum House", "Dim sum and Cantonese roast meats"),
+    ("Bakery", "Neighborhood bakery known for croissants and sourdough"),
+]
+
+DEFAULT_LOCATION = {"lat": 33.7756, "lng": -84.3963}
+# Generated places are named fake-{lat}-{lng}-{index}
+FAKE_PLACE_ID = re.compile(r"fake-(-?[0-9.]+)-(-?[0-9.]+)-[0-9]+")
+
+
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+def fake_place_location(place_id):
+    """
+    The location a generated place id was made from, or DEFAULT_LOCATION for
+    any other id
+    """
+    match = FAKE_PLACE_ID.fullmatch(place_id)
+    if match is None:
+        return DEFAULT_LOCATION["lat"], DEFAULT_LOCATION["lng"]
+    return float(match.group(1)), float(match.group(2))
+
+
+class FakeGoogleClient:
+    """
+    Stand-in for googlemaps.Client that never touches the network. Responses
+    come from a fixture file recorded with RecordingClient, and anything that
+    was not recorded is generated deterministically from the request, so that
+    any search returns plausible places. Every call sleeps latency_ms (plus up
+    to jitter_ms) to mimic Google.
+    """
+
+    def __init__(
+        self,
+        fixtures_path=None,
+        latency_ms=0,
+        jitter_ms=0,
+        results_per_search=20,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.results_per_search = results_per_search
+        self.fixtures = {
+            "places": {},
+            "place": {},
+            "geocode": {},
+            "timezone": {},
+            "geolocate": {},
+        }
+        if fixtures_path and Path(fixtures_path).exists():
+            for kind, responses in json.loads(
+                Path(fixtures_path).read_text()
+            ).items():
+                self.fixtures.setdefault(kind, {}).update(responses)
+
+    def delay(self):
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+
+    def places(
+        self,
+        query=None,
+        location=None,
+        radius=None,
+        type=None,
+        page_token=None,
+        **kwargs,
+    ):
+        time.sleep(self.delay())
+        return self.places_response(query, location, page_token)
+
+    def place(self, place_id, **kwargs):
+        time.sleep(self.delay())
+        return self.place_response(place_id)
+
+    def geocode(self, address=None, **kwargs):
+        time.sleep(self.delay())
+        return self.geocode_response(address)
+
+    def timezone(self, location=None, **kwargs):
+        time.sleep(self.delay())
+        return self.timezone_response()
+
+    def geolocate(self, **kwargs):
+        time.sleep(self.delay())
+        return self.geolocate_response()
+
+    async def arequest(self, path, params):
+        """
+        Same responses for async_gateway, which talks to the web services by
+        path instead of through the client
+        """
+        await asyncio.sleep(self.delay())
+        if path.endswith("/textsearch/json"):
+            latitude, longitude = params["location"].split(",")
+            return self.places_response(
+                params.get("query"),
+                {"lat": float(latitude), "lng": float(longitude)},
+                None,
+            )
+        if path.endswith("/details/json"):
+            return self.place_response(params["place_id"])
+        if path.endswith("/geocode/json"):
+            return {
+                "status": "OK",
+                "results": self.geocode_response(params["address"]),
+            }
+        if path.endswith("/timezone/json"):
+            return self.timezone_response()
+        raise ValueError(f"FakeGoogleClient has no response for {path}")
+
+    async def ageolocate(self):
+        await asyncio.sleep(self.delay())
+        return self.geolocate_response()
+
+    def places_response(self, query, location, page_token):
+        key = f"page_token:{page_token}" if page_token else normalize(query)
+        if key in self.fixtures["places"]:
+            return self.fixtures["places"][key]
+        if page_token:
+            return {"status": "ZERO_RESULTS", "results": []}
+
+        seed = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16)
+        results = []
+        for index in range(self.results_per_search):
+            name, description = CUISINE_DESCRIPTIONS[
+                (seed + index) % len(CUISINE_DESCRIPTIONS)
+            ]
+            # Places sit on a grid around the search location, so nearby
+            # searches share some of them
+            latitude = round(
+                location["lat"] + ((seed + index * 7) % 21 - 10) * 0.0008, 4
+            )
+            longitude = round(
+                location["lng"] + ((seed + index * 11) % 21 - 10) * 0.0008, 4
+            )
+            results.append(
+                {
+                    "place_id": f"fake-{latitude}-{longitude}-{index % len(CUISINE_DESCRIPTIONS)}",
+                    "name": f"{name} {index}",
+                    "business_status": "OPERATIONAL",
+                    "rating": 3.5 + (seed + index) % 4 * 0.5,
+                    "types": ["restaurant", "food", "point_of_interest"],
+                    "geometry": {
+                        "location": {"lat": latitude, "lng": longitude}
+                    },
+                    "opening_hours": {"open_now": index % 3 != 0},
+                }
+            )
+        return {"status": "OK", "results": results}
+
+    def place_response(self, place_id):
+        if place_id in self.fixtures["place"]:
+            return self.fixtures["place"][place_id]
+
+        index = (
+            int(place_id.rsplit("-", 1)[-1])
+            if place_id.rsplit("-", 1)[-1].isdigit()
+            else 0
+        )
+        name, description = CUISINE_DESCRIPTIONS[
+            index % len(CUISINE_DESCRIPTIONS)
+        ]
+        latitude, longitude = fake_place_location(place_id)
+        return {
+            "status": "OK",
+            "result": {
+                "place_id": place_id,
+                "name": name,
+                "adr_address": (
+                    '<span class="street-address">1 Fake St</span>, <span class="locality">Atlanta</span>, '
+                    '<span class="region">GA</span> <span class="postal-code">30332</span>, '
+                    '<span class="country-name">USA</span>'
+                ),
+                "international_phone_number": "+1 404-555-0100",
+                "url": f"https://maps.google.com/?cid={int(hashlib.sha256(place_id.encode()).hexdigest()[:12], 16)}",
+                "editorial_summary": {"overview": description},
+                "opening_hours": {
+                    "open_now": True,
+                    "periods": [
+                        {
+                            "open": {"day": day, "time": "1100"},
+                            "close": {"day": day, "time": "2200"},
+                        }
+                        for day in range(7)
+                    ],
+                },
+                "reviews": [
+                    {
+                        "author_name": "Fake Reviewer",
+                        "rating": 5,
+                        "time": 1700000000,
+                        "text": f"Great {name.lower()}.",
+                    }
+                ],
+                "rating": 4.5,
+                "user_ratings_total": 120,
+                "business_status": "OPERATIONAL",
+                "geometry": {"location": {"lat": latitude, "lng": longitude}},
+            },
+        }
+
+    def geocode_response(self, address):
+        if normalize(address) in self.fixtures["geocode"]:
+            return self.fixtures["geocode"][normalize(address)]
+
+        seed = int(
+            hashlib.sha256(normalize(address).encode()).hexdigest()[:8], 16
+        )
+        return [
+            {
+                "geometry": {
+                    "location": {
+                        "lat": 33.75 + seed % 100 * 0.001,
+                        "lng": -84.39 - seed % 97 * 0.001,
+                    }
+                }
+            }
+        ]
+
+    def timezone_response(self):
+        return self.fixtures["timezone"].get(
+            "default", {"status": "OK", "timeZoneId": "America/New_York"}
+        )
+
+    def geolocate_response(self):
+        return self.fixtures["geolocate"].get(
+            "default", {"location": DEFAULT_LOCATION, "accuracy": 20}
+        )
+
+
+class RecordingClient:
+    """
+    Wraps a real googlemaps.Client and writes every response to a fixture file
+    that FakeGoogleClient can replay
+    """
+
+    def __init__(self, client, fixtures_path):
+        self.client = client
+        self.fixtures_path = Path(fixtures_path)
+        self.lock = threading.Lock()
+
+    def record(self, kind, key, response):
+        with self.lock:
+            fixtures = (
+                json.loads(self.fixtures_path.read_text())
+                if self.fixtures_path.exists()
+                else {}
+            )
+            fixtures.setdefault(kind, {})[key] = response
+            self.fixtures_path.parent.mkdir(parents=True, exist_ok=True)
+            self.fixtures_path.write_text(json.dumps(fixtures, indent=2))
+        return response
+
+    def places(self, query=None, page_token=None, **kwargs):
+        response = self.client.places(
+            query=query, page_token=page_token, **kwargs
+        )
+        return self.record(
+            "places",
+            f"page_token:{page_token}" if page_token else normalize(query),
+            response,
+        )
+
+    def place(self, place_id, **kwargs):
+        return self.record(
+            "place", place_id, self.client.place(place_id=place_id, **kwargs)
+        )
+
+    def geocode(self, address=None, **kwargs):
+        return self.record(
+            "geocode",
+            normalize(address),
+            self.client.geocode(address=address, **kwargs),
+        )
+
+    def timezone(self, location=None, **kwargs):
+        return self.record(
+            "timezone",
+            "default",
+            self.client.timezone(location=location, **kwargs),
+        )
+
+    def geolocate(self, **kwargs):
+        return self.record(
+            "geolocate", "default", self.client.geolocate(**kwargs)
+        )
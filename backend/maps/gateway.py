@@ -0,0 +1,496 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import googlemaps
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from . import geohash
+from .fake_google import FakeGoogleClient, RecordingClient
+from .local_index import local_text_search, record_text_search
+from .resilience import call_google, is_unavailable
+from .models import GeocodeResult
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+
+class ResilientClient:
+    """
+    Wraps googlemaps.Client so that every Places, Geocoding, Timezone and
+    Geolocation call goes through the shared rate limiter, retry policy and
+    circuit breaker of resilience.call_google. The client is built by
+    build_client on first use, so that importing this module needs no API key.
+    """
+
+    def __init__(self, build_client):
+        self.build_client = build_client
+        self.built_client = None
+        self.lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self.lock:
+            if self.built_client is None:
+                self.built_client = self.build_client()
+            return self.built_client
+
+    @client.setter
+    def client(self, client):
+        with self.lock:
+            self.built_client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args, **kwargs: call_google(
+            name, method, *args, **kwargs
+        )
+
+
+def build_requests_session():
+    """
+    Keep-alive connections to Google, enough for every Place Details thread of
+    a few concurrent searches
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=settings.GOOGLE_MAPS_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
+def build_google_client():
+    """
+    The real googlemaps.Client, or with GOOGLE_MAPS_CLIENT = "fake" a
+    FakeGoogleClient that replays recorded fixtures offline, or with "record" a
+    real client that records every response into those fixtures
+    """
+    if settings.GOOGLE_MAPS_CLIENT == "fake":
+        return FakeGoogleClient(
+            settings.GOOGLE_MAPS_FIXTURES,
+            settings.GOOGLE_MAPS_FAKE_LATENCY_MS,
+            settings.GOOGLE_MAPS_FAKE_JITTER_MS,
+        )
+
+    client = googlemaps.Client(
+        key=GOOGLE_API_KEY,
+        timeout=settings.GOOGLE_MAPS_TIMEOUT,
+        retry_timeout=settings.GOOGLE_MAPS_TIMEOUT,
+        # OVER_QUERY_LIMIT is retried by call_google, and its token bucket
+        # replaces the client's own limiter, which is not thread-safe
+        retry_over_query_limit=False,
+        queries_per_second=settings.GOOGLE_MAPS_QPS * 10,
+        queries_per_minute=settings.GOOGLE_MAPS_QPS * 600,
+        requests_session=build_requests_session(),
+    )
+    if settings.GOOGLE_MAPS_CLIENT == "record":
+        return RecordingClient(client, settings.GOOGLE_MAPS_FIXTURES)
+    return client
+
+
+# Every module calls Google through this one object. Swapping gmaps.client (as
+# the load_test command does with a FakeGoogleClient) redirects all of them,
+# async_gateway included, and a client swapped in before the first call means
+# the real one is never built.
+gmaps = ResilientClient(build_google_client)
+
+# Place Details fields are cached in groups so that each group can have its own
+# TTL. Anything not listed here belongs to the "static" group (name, address,
+# url, phone number, ...), which changes rarely.
+PLACE_DETAILS_FIELD_GROUPS = {
+    "hours": [
+        "opening_hours",
+        "current_opening_hours",
+        "secondary_opening_hours",
+        "business_status",
+    ],
+    "reviews": ["reviews", "rating", "user_ratings_total"],
+}
+
+
+class CacheStats:
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, hit):
+        with self.lock:
+            counts = self.counts.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {name: dict(counts) for name, counts in self.counts.items()}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single call whose result
+    (or exception) every caller gets
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self.calls[key] = SingleFlight.Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+cache = caches[settings.PLACES_CACHE_ALIAS]
+
+cache_stats = CacheStats()
+geocode_flight = SingleFlight()
+text_search_flight = SingleFlight()
+
+
+def place_details_cache_key(place_id, group):
+    return f"places:details:{group}:{place_id}"
+
+
+def stale_cache_key(key):
+    return f"{key}:stale"
+
+
+def with_stale_fallback(key, fetch):
+    """
+    Calls fetch and keeps its result for STALE_CACHE_TTL seconds, long after
+    the regular entry has expired. While Google is unavailable (circuit open,
+    quota exhausted, 5xx, timeouts) that stale copy is served instead of
+    failing.
+    """
+    try:
+        value = fetch()
+    except Exception as error:
+        if not is_unavailable(error):
+            raise
+        value = cache.get(stale_cache_key(key))
+        cache_stats.record("stale", hit=value is not None)
+        if value is None:
+            raise
+        logger.warning(
+            "Google Maps is unavailable (%s), serving a stale copy of %s",
+            error,
+            key,
+        )
+        return value
+
+    cache.set(stale_cache_key(key), value, settings.STALE_CACHE_TTL)
+    return value
+
+
+def split_place_details(place_result):
+    groups = {
+        "static": {},
+        **{group: {} for group in PLACE_DETAILS_FIELD_GROUPS},
+    }
+    for field, value in place_result.items():
+        group = next(
+            (
+                group
+                for group, fields in PLACE_DETAILS_FIELD_GROUPS.items()
+                if field in fields
+            ),
+            "static",
+        )
+        groups[group][field] = value
+    return groups
+
+
+def get_place_details(place_id):
+    """
+    Read-through cache in front of gmaps.place. The response is only served
+    from the cache when every field group is still fresh, otherwise the full
+    details are fetched again and every group is re-cached with its own TTL.
+    """
+    keys = {
+        group: place_details_cache_key(place_id, group)
+        for group in settings.PLACES_CACHE_TTLS
+    }
+    cached = cache.get_many(list(keys.values()))
+    if len(cached) == len(keys):
+        cache_stats.record("place_details", hit=True)
+        place_result = {}
+        for key in keys.values():
+            place_result.update(cached[key])
+        return place_result
+
+    cache_stats.record("place_details", hit=False)
+    place_result = with_stale_fallback(
+        place_details_cache_key(place_id, "all"),
+        lambda: gmaps.place(place_id=place_id, reviews_sort="most_relevant")[
+            "result"
+        ],
+    )
+    for group, fields in split_place_details(place_result).items():
+        cache.set(keys[group], fields, settings.PLACES_CACHE_TTLS[group])
+    return place_result
+
+
+def get_place_details_or_none(place_id):
+    try:
+        return get_place_details(place_id)
+    except Exception as error:
+        if not is_unavailable(error):
+            raise
+        logger.warning(
+            "Place Details lookup for %s failed (%s), dropping it from the results",
+            place_id,
+            error,
+        )
+        return None
+
+
+def fetch_place_details(place_ids):
+    """
+    Runs the Place Details lookups concurrently and returns them in the same
+    order as place_ids, with None for any lookup that timed out
+    """
+    if len(place_ids) == 0:
+        return []
+
+    with ThreadPoolExecutor(
+        max_workers=min(settings.PLACES_DETAILS_MAX_WORKERS, len(place_ids))
+    ) as executor:
+        return list(executor.map(get_place_details_or_none, place_ids))
+
+
+def iter_place_details(place_ids):
+    """
+    Same lookups as fetch_place_details, but yields (index, place_result) pairs
+    as soon as each lookup finishes
+    """
+    if len(place_ids) == 0:
+        return
+
+    with ThreadPoolExecutor(
+        max_workers=min(settings.PLACES_DETAILS_MAX_WORKERS, len(place_ids))
+    ) as executor:
+        futures = {
+            executor.submit(get_place_details_or_none, place_id): index
+            for index, place_id in enumerate(place_ids)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def normalize_address(address):
+    return " ".join(address.lower().replace(",", " ").split())
+
+
+def geocode(address):
+    """
+    Returns the {"lat", "lng"} location of an address, or None when Google
+    cannot find it. Results are kept in the GeocodeResult table so they survive
+    restarts, and concurrent lookups of the same address share one upstream
+    call.
+    """
+    normalized_address = normalize_address(address)
+    return geocode_flight.do(
+        normalized_address,
+        lambda: geocode_normalized_address(normalized_address),
+    )
+
+
+def geocode_normalized_address(normalized_address):
+    cutoff = timezone.now() - timedelta(seconds=settings.GEOCODE_CACHE_TTL)
+    geocode_result = GeocodeResult.objects.filter(
+        normalized_address=normalized_address, updated_at__gte=cutoff
+    ).first()
+    if geocode_result is not None:
+        cache_stats.record("geocode", hit=True)
+    else:
+        cache_stats.record("geocode", hit=False)
+        try:
+            results = gmaps.geocode(address=normalized_address)
+        except Exception as error:
+            # An expired row is still better than none while Google is down
+            geocode_result = GeocodeResult.objects.filter(
+                normalized_address=normalized_address
+            ).first()
+            if not is_unavailable(error) or geocode_result is None:
+                raise
+            logger.warning(
+                "Google Maps is unavailable (%s), using a stale geocode of %s",
+                error,
+                normalized_address,
+            )
+        else:
+            location = (
+                results[0]["geometry"]["location"]
+                if len(results) > 0
+                else {"lat": None, "lng": None}
+            )
+            geocode_result, created = GeocodeResult.objects.update_or_create(
+                normalized_address=normalized_address,
+                defaults={
+                    "latitude": location["lat"],
+                    "longitude": location["lng"],
+                },
+            )
+
+    if geocode_result.latitude is None:
+        return None
+    return {"lat": geocode_result.latitude, "lng": geocode_result.longitude}
+
+
+def text_search_cache_key(location, query, radius, types):
+    """
+    Searches a few meters apart land in the same geohash cell and so share a
+    cache entry. Only the text-search stage is cached, per-user fields are
+    added on top by the caller.
+    """
+    cell = geohash.encode(
+        location["lat"],
+        location["lng"],
+        settings.SEARCH_CACHE_GEOHASH_PRECISION,
+    )
+    digest = hashlib.sha256(
+        f"{search_query_digest(query, types)}|{radius}".encode()
+    ).hexdigest()
+    return f"places:search:{cell}:{digest}"
+
+
+def search_query_digest(query, types):
+    normalized_query = " ".join(query.lower().split())
+    return hashlib.sha256(
+        f"{normalized_query}|{','.join(sorted(types))}".encode()
+    ).hexdigest()
+
+
+def text_search(location, query, radius, types):
+    key = text_search_cache_key(location, query, radius, types)
+
+    def search():
+        result = cache.get(key)
+        if result is not None:
+            cache_stats.record("text_search", hit=True)
+            return result
+
+        cache_stats.record("text_search", hit=False)
+        query_digest = search_query_digest(query, types)
+        if settings.LOCAL_SEARCH_ENABLED:
+            result = local_text_search(location, query_digest, radius)
+            cache_stats.record("local_search", hit=result is not None)
+        if result is None:
+            result = with_stale_fallback(
+                key,
+                lambda: fetch_text_search(
+                    location=location, query=query, radius=radius, type=types
+                ),
+            )
+            if settings.LOCAL_SEARCH_ENABLED:
+                record_text_search(
+                    location, query_digest, radius, result["results"]
+                )
+        cache.set(key, result, settings.SEARCH_CACHE_TTL)
+        return result
+
+    return text_search_flight.do(key, search)
+
+
+def fetch_text_search(**kwargs):
+    """
+    gmaps.places, stamped with the time Google issued the result's
+    next_page_token
+    """
+    return {**gmaps.places(**kwargs), "fetched_at": time.time()}
+
+
+def text_search_page(location, query, radius, types, page):
+    """
+    Returns the page-th (0-based) page of a text search, following
+    next_page_token from page to page, or None when the search has fewer pages.
+    Every page is cached like the first one, so walking to page N only calls
+    Google for the pages nobody has asked for recently.
+    """
+    key = text_search_cache_key(location, query, radius, types)
+    result = text_search(location, query, radius, types)
+    for page_number in range(1, page + 1):
+        page_token = result.get("next_page_token")
+        if page_token is None:
+            return None
+        result = text_search_next_page(
+            f"{key}:page:{page_number}",
+            page_token,
+            result.get("fetched_at", 0),
+        )
+    return result
+
+
+def text_search_next_page(key, page_token, issued_at):
+    """
+    Raises googlemaps.exceptions.ApiError when Google refuses page_token, e.g.
+    because it has expired
+    """
+
+    def search():
+        result = cache.get(key)
+        if result is not None:
+            cache_stats.record("text_search", hit=True)
+            return result
+
+        cache_stats.record("text_search", hit=False)
+        for attempt in range(settings.SEARCH_PAGE_TOKEN_RETRIES):
+            try:
+                result = with_stale_fallback(
+                    key, lambda: fetch_text_search(page_token=page_token)
+                )
+                break
+            except googlemaps.exceptions.ApiError as error:
+                # Google answers INVALID_REQUEST until a token is ready, a
+                # couple of seconds after it was issued. An older token that is
+                # still refused has expired or was never valid, and waiting
+                # would not help.
+                token_age = time.time() - issued_at
+                just_issued = (
+                    token_age
+                    < settings.SEARCH_PAGE_TOKEN_DELAY
+                    * settings.SEARCH_PAGE_TOKEN_RETRIES
+                )
+                if (
+                    error.status != "INVALID_REQUEST"
+                    or not just_issued
+                    or attempt == settings.SEARCH_PAGE_TOKEN_RETRIES - 1
+                ):
+                    raise
+                time.sleep(settings.SEARCH_PAGE_TOKEN_DELAY)
+        cache.set(key, result, settings.SEARCH_CACHE_TTL)
+        return result
+
+    return text_search_flight.do(key, search)
@@ -0,0 +1,93 @@
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(latitude, longitude, precision=7):
+    """
+    Standard geohash of a point. Nearby points share a prefix, and each extra
+    character shrinks the cell roughly by a factor of 32, so precision 7 is a
+    ~150m cell and precision 5 a ~5km one.
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    is_longitude_bit = True
+    while len(geohash) < precision:
+        value_range, value = (
+            (longitude_range, longitude)
+            if is_longitude_bit
+            else (latitude_range, latitude)
+        )
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            value_range[0] = middle
+        else:
+            bits = bits << 1
+            value_range[1] = middle
+        is_longitude_bit = not is_longitude_bit
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def cell_size(precision):
+    """
+    Height and width in degrees of the cells of a precision
+    """
+    bit_count = precision * 5
+    longitude_bits = (bit_count + 1) // 2
+    latitude_bits = bit_count // 2
+    return 180.0 / 2**latitude_bits, 360.0 / 2**longitude_bits
+
+
+def decode(geohash):
+    """
+    Center (latitude, longitude) of a cell
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+
+    is_longitude_bit = True
+    for character in geohash:
+        bits = BASE32.index(character)
+        for shift in range(4, -1, -1):
+            value_range = (
+                longitude_range if is_longitude_bit else latitude_range
+            )
+            middle = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            is_longitude_bit = not is_longitude_bit
+
+    return (latitude_range[0] + latitude_range[1]) / 2, (
+        longitude_range[0] + longitude_range[1]
+    ) / 2
+
+
+def cells_in_bounds(south, west, north, east, precision):
+    """
+    Every cell of a precision that intersects a latitude/longitude box
+    """
+    height, width = cell_size(precision)
+    latitudes = [
+        south + height * step
+        for step in range(int((north - south) / height) + 1)
+    ] + [north]
+    longitudes = [
+        west + width * step for step in range(int((east - west) / width) + 1)
+    ] + [east]
+    return {
+        encode(latitude, longitude, precision)
+        for latitude in latitudes
+        for longitude in longitudes
+    }
@@ -0,0 +1,250 @@
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def authkey():
+    return settings.SECRET_KEY.encode()
+
+
+class InferenceServer:
+    """
+    Owns the only copy of the model and serves cuisine predictions and
+    description embeddings to every web worker over a Unix socket. Requests
+    that arrive close together are merged into one forward pass: a batch is
+    closed once it holds max_batch_size descriptions or max_wait_ms after its
+    first request arrived, whichever comes first.
+    """
+
+    PREDICT = "predict"
+    EMBED = "embed"
+    EMBED_AND_PREDICT = "embed_and_predict"
+
+    class Request:
+        def __init__(self, operation, descriptions, top_k):
+            self.operation = operation
+            self.descriptions = descriptions
+            self.top_k = top_k
+            self.result = queue.Queue(maxsize=1)
+
+    def __init__(self, address, max_batch_size, max_wait_ms):
+        self.address = address
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+        threading.Thread(target=self.run_batches, daemon=True).start()
+        with Listener(
+            self.address, family="AF_UNIX", authkey=authkey()
+        ) as listener:
+            logger.info(
+                "Cuisine inference worker listening on %s", self.address
+            )
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception:
+                    logger.exception(
+                        "Failed to accept an inference connection"
+                    )
+                    continue
+                threading.Thread(
+                    target=self.handle_connection,
+                    args=(connection,),
+                    daemon=True,
+                ).start()
+
+    def handle_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    operation, descriptions, top_k = connection.recv()
+                except EOFError:
+                    return
+
+                request = InferenceServer.Request(
+                    operation, descriptions, top_k
+                )
+                self.requests.put(request)
+                connection.send(request.result.get())
+
+    def next_batch(self):
+        batch = [self.requests.get()]
+        size = len(batch[0].descriptions)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.descriptions)
+        return batch
+
+    def run_batches(self):
+        from .cuisines import get_model
+
+        get_model()
+        while True:
+            batch = self.next_batch()
+            top_k = max(
+                (
+                    request.top_k
+                    for request in batch
+                    if request.operation != self.EMBED
+                ),
+                default=0,
+            )
+            try:
+                results = self.run_batch(batch, top_k)
+            except Exception as error:
+                logger.exception(
+                    "Cuisine inference failed for a batch of %d requests",
+                    len(batch),
+                )
+                results = [RuntimeError(str(error))] * len(batch)
+
+            for request, result in zip(batch, results):
+                request.result.put(result)
+
+    def run_batch(self, batch, top_k):
+        from .cuisines import (
+            encode_descriptions_local,
+            top_cuisines_from_embeddings,
+        )
+
+        embeddings = encode_descriptions_local(
+            [
+                description
+                for request in batch
+                for description in request.descriptions
+            ]
+        )
+        top_cuisine_types_per_description = (
+            top_cuisines_from_embeddings(embeddings, top_k=top_k)
+            if top_k > 0
+            else None
+        )
+
+        results = []
+        start = 0
+        for request in batch:
+            end = start + len(request.descriptions)
+            if request.operation == self.EMBED:
+                results.append(
+                    embeddings[start:end].cpu().numpy().astype("float32")
+                )
+                start = end
+                continue
+
+            top_cuisine_types_per_request = [
+                top_cuisine_types[: request.top_k]
+                for top_cuisine_types in top_cuisine_types_per_description[
+                    start:end
+                ]
+            ]
+            if request.operation == self.PREDICT:
+                results.append(top_cuisine_types_per_request)
+            else:
+                results.append(
+                    (
+                        embeddings[start:end].cpu().numpy().astype("float32"),
+                        top_cuisine_types_per_request,
+                    )
+                )
+            start = end
+        return results
+
+
+class InferenceClient:
+    """
+    Keeps one connection to the inference worker per thread. Returns None
+    whenever the worker cannot be reached so that the caller can fall back to
+    in-process inference, and waits retry_after seconds before trying to
+    reconnect.
+    """
+
+    def __init__(self, address, timeout=10, retry_after=5):
+        self.address = address
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.local = threading.local()
+        self.unavailable_until = 0
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = Client(
+                self.address, family="AF_UNIX", authkey=authkey()
+            )
+        return connection
+
+    def disconnect(self):
+        connection = getattr(self.local, "connection", None)
+        self.local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def predict_top_cuisines_batch(self, descriptions, top_k):
+        return self.call(InferenceServer.PREDICT, descriptions, top_k)
+
+    def embed_descriptions(self, descriptions):
+        return self.call(InferenceServer.EMBED, descriptions, None)
+
+    def embed_and_predict_top_cuisines_batch(self, descriptions, top_k):
+        return self.call(
+            InferenceServer.EMBED_AND_PREDICT, descriptions, top_k
+        )
+
+    def call(self, operation, descriptions, top_k):
+        if time.monotonic() < self.unavailable_until:
+            return None
+
+        try:
+            connection = self.connection()
+            connection.send((operation, descriptions, top_k))
+            if not connection.poll(self.timeout):
+                raise TimeoutError(f"no reply within {self.timeout} seconds")
+            result = connection.recv()
+        except (OSError, EOFError, AuthenticationError) as error:
+            logger.warning(
+                "Cuisine inference worker at %s is unavailable (%s), predicting in-process",
+                self.address,
+                error,
+            )
+            self.disconnect()
+            self.unavailable_until = time.monotonic() + self.retry_after
+            return None
+
+        if isinstance(result, Exception):
+            logger.warning(
+                "Cuisine inference worker failed (%s), predicting in-process",
+                result,
+            )
+            return None
+        return result
+
+
+inference_client = (
+    InferenceClient(settings.CUISINE_INFERENCE_SOCKET)
+    if settings.CUISINE_INFERENCE_SOCKET
+    else None
+)
@@ -0,0 +1,162 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import geohash
+from .models import Place, SearchTile
+
+EARTH_RADIUS_METERS = 6371000
+
+
+def distance_meters(latitude1, longitude1, latitude2, longitude2):
+    """
+    Haversine distance between two points
+    """
+    latitude1, longitude1, latitude2, longitude2 = map(
+        math.radians, (latitude1, longitude1, latitude2, longitude2)
+    )
+    a = (
+        math.sin((latitude2 - latitude1) / 2) ** 2
+        + math.cos(latitude1)
+        * math.cos(latitude2)
+        * math.sin((longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def search_bounds(location, radius):
+    """
+    (south, west, north, east) bounding box of the search circle
+    """
+    latitude_delta = math.degrees(radius / EARTH_RADIUS_METERS)
+    longitude_delta = latitude_delta / max(
+        math.cos(math.radians(location["lat"])), 0.01
+    )
+    return (
+        location["lat"] - latitude_delta,
+        location["lng"] - longitude_delta,
+        location["lat"] + latitude_delta,
+        location["lng"] + longitude_delta,
+    )
+
+
+def covered_cells(location, radius):
+    """
+    Cells a Google search is trusted to have covered: the cell of the search
+    location and every cell whose center lies inside the search circle. Returns
+    None when the circle's bounding box spans more than LOCAL_SEARCH_MAX_CELLS
+    cells.
+    """
+    precision = settings.LOCAL_SEARCH_GEOHASH_PRECISION
+    south, west, north, east = search_bounds(location, radius)
+    height, width = geohash.cell_size(precision)
+    if ((north - south) / height + 1) * (
+        (east - west) / width + 1
+    ) > settings.LOCAL_SEARCH_MAX_CELLS:
+        return None
+
+    cells = {
+        cell
+        for cell in geohash.cells_in_bounds(
+            south, west, north, east, precision
+        )
+        if distance_meters(
+            location["lat"], location["lng"], *geohash.decode(cell)
+        )
+        <= radius
+    }
+    cells.add(geohash.encode(location["lat"], location["lng"], precision))
+    return cells
+
+
+def local_text_search(location, query_digest, radius):
+    """
+    Answers a text search from the local index in the same {"results": [...]}
+    shape as Google, or returns None when one of the cells the search would
+    cover is stale or has never been searched for this query, or when too few
+    places match
+    """
+    cells = covered_cells(location, radius)
+    if cells is None:
+        return None
+    cutoff = timezone.now() - timedelta(seconds=settings.LOCAL_SEARCH_TTL)
+    tiles = list(
+        SearchTile.objects.filter(
+            geohash__in=cells,
+            query_digest=query_digest,
+            searched_at__gte=cutoff,
+        )
+    )
+    if len(tiles) < len(cells):
+        return None
+
+    places = [
+        place
+        for place in Place.objects.filter(search_tiles__in=tiles).distinct()
+        if place.latitude is not None
+        and distance_meters(
+            location["lat"], location["lng"], place.latitude, place.longitude
+        )
+        <= radius
+    ]
+    if len(places) < settings.LOCAL_SEARCH_MIN_RESULTS:
+        return None
+
+    places.sort(key=lambda place: -(place.rating or 0))
+    return {
+        "results": [place.to_search_result() for place in places],
+        "status": "OK",
+    }
+
+
+def record_text_search(location, query_digest, radius, results):
+    """
+    Stores the hits of a Google text search on their places and, unless it was
+    too wide, marks the cells the search covered as fresh for the query, linked
+    to the hits that fall inside them
+    """
+    places, created = Place.objects.get_or_create_many(
+        [place["place_id"] for place in results]
+    )
+    for place in results:
+        places[place["place_id"]].update_search_result(place)
+
+    cells = covered_cells(location, radius)
+    now = timezone.now()
+    with transaction.atomic():
+        Place.objects.bulk_update(places.values(), Place.SEARCH_RESULT_FIELDS)
+        if cells is None:
+            return
+        SearchTile.objects.bulk_create(
+            [
+                SearchTile(
+                    geohash=cell, query_digest=query_digest, searched_at=now
+                )
+                for cell in cells
+            ],
+            update_conflicts=True,
+            unique_fields=["geohash", "query_digest"],
+            update_fields=["searched_at"],
+        )
+        tiles = {
+            tile.geohash: tile
+            for tile in SearchTile.objects.filter(
+                geohash__in=cells, query_digest=query_digest
+            )
+        }
+        SearchTile.places.through.objects.filter(
+            searchtile__in=tiles.values()
+        ).delete()
+        precision = settings.LOCAL_SEARCH_GEOHASH_PRECISION
+        SearchTile.places.through.objects.bulk_create(
+            [
+                SearchTile.places.through(
+                    searchtile=tiles[place.geohash[:precision]], place=place
+                )
+                for place in places.values()
+                if place.geohash[:precision] in tiles
+            ]
+        )
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from functools import lru_cache
+
+import pytz
+from django.conf import settings
+
+from . import async_gateway
+from .gateway import cache, cache_stats, gmaps
+
+# timezonefinder resolves a point against an offline copy of the timezone
+# boundaries. It is in requirements.txt, and when it is not installed
+# timezones come from Google and are cached per grid cell instead.
+try:
+    from timezonefinder import TimezoneFinder
+except ImportError:
+    TimezoneFinder = None
+
+timezone_finder = None
+timezone_finder_lock = threading.Lock()
+
+
+def get_timezone_finder():
+    global timezone_finder
+
+    with timezone_finder_lock:
+        if timezone_finder is None and TimezoneFinder is not None:
+            timezone_finder = TimezoneFinder()
+    return timezone_finder
+
+
+@lru_cache(maxsize=None)
+def get_zone(timezone_id):
+    """
+    pytz builds a zone by reading and parsing its tzdata file, so every zone is
+    built once per process
+    """
+    return pytz.timezone(timezone_id)
+
+
+def local_timezone_id(location):
+    finder = get_timezone_finder()
+    if finder is None:
+        return None
+    return finder.timezone_at(lat=location["lat"], lng=location["lng"])
+
+
+def timezone_cache_key(location):
+    grid = settings.TIMEZONE_GRID_DEGREES
+    return f"timezone:{round(location['lat'] / grid)}:{round(location['lng'] / grid)}"
+
+
+def timezone_id(location):
+    """
+    Timezone id of a point, resolved offline when timezonefinder is installed
+    and otherwise asked from Google once per TIMEZONE_GRID_DEGREES cell
+    """
+    resolved_timezone_id = local_timezone_id(location)
+    if resolved_timezone_id is not None:
+        return resolved_timezone_id
+
+    key = timezone_cache_key(location)
+    resolved_timezone_id = cache.get(key)
+    cache_stats.record("timezone", hit=resolved_timezone_id is not None)
+    if resolved_timezone_id is None:
+        resolved_timezone_id = gmaps.timezone(location=location)["timeZoneId"]
+        cache.set(key, resolved_timezone_id, settings.TIMEZONE_CACHE_TTL)
+    return resolved_timezone_id
+
+
+async def atimezone_id(location):
+    # Building the TimezoneFinder reads its boundary files, and a lookup is
+    # CPU work, so neither runs on the event loop
+    resolved_timezone_id = await asyncio.to_thread(local_timezone_id, location)
+    if resolved_timezone_id is not None:
+        return resolved_timezone_id
+
+    key = timezone_cache_key(location)
+    resolved_timezone_id = (await cache.aget_many([key])).get(key)
+    cache_stats.record("timezone", hit=resolved_timezone_id is not None)
+    if resolved_timezone_id is None:
+        resolved_timezone_id = await async_gateway.timezone_id(location)
+        await cache.aset(
+            key, resolved_timezone_id, settings.TIMEZONE_CACHE_TTL
+        )
+    return resolved_timezone_id
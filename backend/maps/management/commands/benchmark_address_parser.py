@@ -0,0 +1,57 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maps.address import parse_address, parse_address_parts
+
+SAMPLE_ADDRESSES = [
+    '<span class="street-address">North Ave NW</span>, <span class="locality">Atlanta</span>, '
+    '<span class="region">GA</span> <span class="postal-code">30332</span>, '
+    '<span class="country-name">USA</span>',
+    '<span class="street-address">1 Ferry Building</span>, <span class="locality">San Francisco</span>, '
+    '<span class="region">CA</span> <span class="postal-code">94111</span>, '
+    '<span class="country-name">USA</span>',
+    '<span class="street-address">200 Peachtree St NW</span>, <span class="locality">Atlanta</span>, '
+    '<span class="region">GA</span> <span class="postal-code">30303</span>, '
+    '<span class="country-name">USA</span>',
+]
+
+
+def parse_address_uncached(address_string):
+    pattern = r'<span class="([^"]+)">([^<]+)</span>'
+    matches = re.findall(pattern, address_string)
+    return {
+        class_name.replace("-", "_"): content
+        for class_name, content in matches
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares the memoized address parser with parsing the adr_address HTML on every call"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        addresses = (
+            SAMPLE_ADDRESSES * (options["repeat"] // len(SAMPLE_ADDRESSES) + 1)
+        )[: options["repeat"]]
+        for address in SAMPLE_ADDRESSES:
+            if parse_address(address) != parse_address_uncached(address):
+                raise CommandError(f"Parsers disagree on {address}")
+
+        parse_address_parts.cache_clear()
+        for name, parse in [
+            ("uncached", parse_address_uncached),
+            ("memoized", parse_address),
+        ]:
+            start = time.perf_counter()
+            for address in addresses:
+                parse(address)
+            seconds = time.perf_counter() - start
+            self.stdout.write(
+                f"{name:>8}: {seconds / len(addresses) * 1e6:.2f} us per address"
+            )
+
+        self.stdout.write(f"memo: {parse_address_parts.cache_info()}")
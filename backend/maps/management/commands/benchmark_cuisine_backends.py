@@ -0,0 +1,118 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maps.cuisines import CUISINE_TYPES, INFERENCE_BACKENDS, load_model
+
+SAMPLE_DESCRIPTIONS = [
+    "Family-run trattoria serving handmade pasta and wood-fired pizza",
+    "Late-night noodle bar with rich tonkotsu broth",
+    "Classic diner with pancakes, eggs and bottomless coffee",
+    "Street tacos, burritos and fresh salsa",
+    "Upscale steakhouse with dry-aged cuts and an extensive wine list",
+    "Plant-based bowls, smoothies and salads",
+    "Dim sum and Cantonese roast meats",
+    "Neighborhood bakery known for croissants and sourdough",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks that every cuisine inference backend agrees with the full precision torch backend on the 41 cuisine "
+        "labels and compares their throughput and latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backends",
+            nargs="+",
+            default=INFERENCE_BACKENDS,
+            choices=INFERENCE_BACKENDS,
+        )
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument(
+            "--min-agreement",
+            type=float,
+            default=0.95,
+            help="Fail when a backend's top-1 agreement with torch on the labels falls below this fraction",
+        )
+
+    def handle(self, *args, **options):
+        parity_texts = CUISINE_TYPES + SAMPLE_DESCRIPTIONS
+        benchmark_texts = (
+            SAMPLE_DESCRIPTIONS
+            * (options["batch_size"] // len(SAMPLE_DESCRIPTIONS) + 1)
+        )[: options["batch_size"]]
+
+        reference_predictions = None
+        failures = []
+        for backend in ["torch"] + [
+            backend for backend in options["backends"] if backend != "torch"
+        ]:
+            model = load_model(backend)
+            cuisine_embeddings = model.encode(
+                CUISINE_TYPES,
+                convert_to_tensor=True,
+                normalize_embeddings=True,
+            )
+
+            def predict(texts):
+                embeddings = model.encode(
+                    texts, convert_to_tensor=True, normalize_embeddings=True
+                )
+                return (
+                    (embeddings @ cuisine_embeddings.T)
+                    .topk(k=2, dim=1)
+                    .indices.tolist()
+                )
+
+            predictions = predict(parity_texts)
+            label_self_match = sum(
+                indices[0] == label_index
+                for label_index, indices in enumerate(
+                    predictions[: len(CUISINE_TYPES)]
+                )
+            ) / len(CUISINE_TYPES)
+            if reference_predictions is None:
+                reference_predictions = predictions
+            top1_agreement = sum(
+                indices[0] == reference[0]
+                for indices, reference in zip(
+                    predictions, reference_predictions
+                )
+            ) / len(predictions)
+            top2_agreement = sum(
+                set(indices) == set(reference)
+                for indices, reference in zip(
+                    predictions, reference_predictions
+                )
+            ) / len(predictions)
+
+            predict(benchmark_texts)
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                predict(benchmark_texts)
+            batch_seconds = (time.perf_counter() - start) / options["repeat"]
+
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                predict(benchmark_texts[:1])
+            single_seconds = (time.perf_counter() - start) / options["repeat"]
+
+            self.stdout.write(
+                f"{backend:>10}: labels predicting themselves {label_self_match:.0%}, "
+                f"top-1 agreement with torch {top1_agreement:.0%}, top-2 agreement {top2_agreement:.0%}, "
+                f"{len(benchmark_texts) / batch_seconds:.0f} descriptions/s at batch size {len(benchmark_texts)}, "
+                f"{single_seconds * 1000:.1f} ms for a single description"
+            )
+            if (
+                backend in options["backends"]
+                and top1_agreement < options["min_agreement"]
+            ):
+                failures.append(backend)
+
+        if failures:
+            raise CommandError(
+                f"Backends below {options['min_agreement']:.0%} top-1 agreement: {', '.join(failures)}"
+            )
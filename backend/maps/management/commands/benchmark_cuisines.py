@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maps.cuisines import (
+    CUISINE_TYPES,
+    predict_top_cuisines,
+    predict_top_cuisines_batch,
+)
+
+
+class Command(BaseCommand):
+    help = "Compares per-search cuisine prediction latency of the per-place loop against the batched API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--places",
+            type=int,
+            default=20,
+            help="Number of places in one simulated search",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Number of simulated searches to time",
+        )
+
+    def handle(self, *args, **options):
+        descriptions = [
+            f"A neighborhood spot serving {CUISINE_TYPES[i % len(CUISINE_TYPES)].lower()} and drinks"
+            for i in range(options["places"])
+        ]
+
+        # Warm up so that neither path pays for lazy initialization while
+        # being timed
+        predict_top_cuisines_batch(descriptions, top_k=2)
+
+        start = time.perf_counter()
+        for _ in range(options["repeat"]):
+            for description in descriptions:
+                predict_top_cuisines(description, top_k=2)
+        loop_ms = (time.perf_counter() - start) * 1000 / options["repeat"]
+
+        start = time.perf_counter()
+        for _ in range(options["repeat"]):
+            predict_top_cuisines_batch(descriptions, top_k=2)
+        batch_ms = (time.perf_counter() - start) * 1000 / options["repeat"]
+
+        self.stdout.write(
+            f"Places per search: {options['places']}, searches timed: {options['repeat']}"
+        )
+        self.stdout.write(f"Per-place loop: {loop_ms:.1f} ms per search")
+        self.stdout.write(
+            f"Batched:        {batch_ms:.1f} ms per search ({loop_ms / batch_ms:.1f}x faster)"
+        )
@@ -0,0 +1,65 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Each sample runs in a fresh interpreter so that nothing is already imported
+IMPORT_SCRIPT = """
+import os
+import time
+
+start = time.perf_counter()
+import django
+
+django.setup()
+import core.urls
+
+if os.environ.get("BENCHMARK_EAGER_MODEL") == "True":
+    from maps.cuisines import get_model
+
+    get_model()
+print(time.perf_counter() - start)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Times a cold import of core.urls with the cuisine model loaded lazily (current behaviour) and eagerly (what "
+        "every process paid before the model was made lazy)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def sample(self, eager):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "core.settings"
+            ),
+            "CUISINE_MODEL_WARMUP": "False",
+            "BENCHMARK_EAGER_MODEL": str(eager),
+        }
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return float(output.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        for label, eager in [
+            ("Lazy model (after)", False),
+            ("Eager model (before)", True),
+        ]:
+            samples = [self.sample(eager) for _ in range(options["repeat"])]
+            self.stdout.write(
+                f"{label}: median {statistics.median(samples) * 1000:.0f} ms, "
+                f"min {min(samples) * 1000:.0f} ms over {options['repeat']} cold imports"
+            )
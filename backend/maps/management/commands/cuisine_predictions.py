@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from maps.cuisines import cuisine_model_version, predict_cached_cuisines
+from maps.gateway import fetch_place_details
+from maps.models import Place
+
+
+class Command(BaseCommand):
+    help = "Backfills or invalidates the cuisine predictions cached on Place"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["backfill", "invalidate"])
+        parser.add_argument(
+            "--place-id",
+            action="append",
+            dest="place_ids",
+            default=[],
+            help="Google place id to process, can be repeated. Defaults to every place.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Backfill: re-check every place instead of only those missing predictions for the current model",
+        )
+        parser.add_argument("--batch-size", type=int, default=64)
+
+    def handle(self, *args, **options):
+        places = Place.objects.all()
+        if options["place_ids"]:
+            places = places.filter(google_place_id__in=options["place_ids"])
+
+        if options["action"] == "invalidate":
+            count = places.update(
+                predicted_cuisines=[],
+                cuisine_model_version="",
+                cuisine_source_hash="",
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Invalidated cuisine predictions for {count} places"
+                )
+            )
+            return
+
+        if not options["all"]:
+            places = places.filter(
+                Q(predicted_cuisines=[])
+                | ~Q(cuisine_model_version=cuisine_model_version())
+            )
+
+        places = list(places.order_by("id"))
+        for start in range(0, len(places), options["batch_size"]):
+            batch = places[start : start + options["batch_size"]]
+
+            places_with_text = []
+            place_results = fetch_place_details(
+                [place.google_place_id for place in batch]
+            )
+            for place, place_result in zip(batch, place_results):
+                if place_result is None:
+                    continue
+
+                description = (
+                    place_result.get("editorial_summary")["overview"]
+                    if place_result.get("editorial_summary")
+                    else None
+                )
+                places_with_text.append(
+                    (
+                        place,
+                        (
+                            description
+                            if description
+                            else place_result.get("name", "")
+                        ),
+                    )
+                )
+
+            predict_cached_cuisines(places_with_text, top_k=2)
+            self.stdout.write(
+                f"Processed {start + len(batch)}/{len(places)} places"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backfilled cuisine predictions for {len(places)} places"
+            )
+        )
@@ -0,0 +1,306 @@
+import json
+import queue
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from maps.fake_google import CUISINE_DESCRIPTIONS, FakeGoogleClient
+from maps.gateway import cache_stats, gmaps
+from maps.models import Place, PlaceReview
+from users.models import FavoritePlace
+
+SEARCH_CUISINES = [
+    "Italian",
+    "Ramen",
+    "Tacos",
+    "Pizza",
+    "Sushi",
+    "Vegan",
+    "Bakery",
+    "Steak",
+]
+SEARCH_LOCATIONS = [
+    {"lat": 33.7756, "lng": -84.3963},
+    {"lat": 33.7490, "lng": -84.3880},
+    {"lat": 33.7838, "lng": -84.3830},
+]
+
+
+def search_body(index):
+    # Cycles through cuisines and locations so that the run mixes cache misses
+    # with repeat searches
+    return {
+        "location": SEARCH_LOCATIONS[index % len(SEARCH_LOCATIONS)],
+        "location_name": "",
+        "cuisine_type": SEARCH_CUISINES[index % len(SEARCH_CUISINES)],
+        "restaurant_name": "",
+        "query": "cuisine_type",
+        "radius": 1500,
+        "rating": 3.0,
+    }
+
+
+def place_details_params(index):
+    # Ids of the places FakeGoogleClient generates around the search locations,
+    # repeated like the searches
+    location = SEARCH_LOCATIONS[index % len(SEARCH_LOCATIONS)]
+    return {
+        "place_id": f"fake-{location['lat']}-{location['lng']}-{index % len(CUISINE_DESCRIPTIONS)}"
+    }
+
+
+ENDPOINTS = {
+    "get_location": ("get", "/maps/api/get_location", None),
+    "search_for_restaurants": (
+        "post",
+        "/maps/api/search_for_restaurants",
+        search_body,
+    ),
+    "async_search_for_restaurants": (
+        "post",
+        "/maps/api/async/search_for_restaurants",
+        search_body,
+    ),
+    "place_details": ("get", "/maps/api/place_details", place_details_params),
+    "get_favorite_places": ("get", "/users/api/get_favorite_places", None),
+    "get_reviews": ("get", "/users/api/get_reviews", None),
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[
+        min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the maps and users APIs offline: Google is replaced by FakeGoogleClient with artificial latency "
+        "and every request runs against a throwaway test database. Reports p50/p95/p99 latency, throughput and "
+        "database queries per endpoint. Searches still run the cuisine model, which must already be downloaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--endpoints",
+            nargs="+",
+            default=list(ENDPOINTS),
+            choices=list(ENDPOINTS),
+        )
+        parser.add_argument(
+            "--requests", type=int, default=100, help="Requests per endpoint"
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Client threads sending requests at once",
+        )
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=100,
+            help="Artificial latency of every Google call",
+        )
+        parser.add_argument("--jitter-ms", type=float, default=50)
+        parser.add_argument(
+            "--fixtures",
+            default=None,
+            help="Recorded Google responses to replay",
+        )
+        parser.add_argument(
+            "--favorites",
+            type=int,
+            default=20,
+            help="Favorite places of the load-test user",
+        )
+        parser.add_argument(
+            "--reviews",
+            type=int,
+            default=50,
+            help="Reviews written by the load-test user",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Reuse the test database between runs",
+        )
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            default=None,
+            help="Also write the results to this file",
+        )
+
+    def handle(self, *args, **options):
+        for option in ["requests", "concurrency"]:
+            if options[option] < 1:
+                raise CommandError(f"--{option} must be at least 1")
+
+        gmaps.client = FakeGoogleClient(
+            options["fixtures"], options["latency_ms"], options["jitter_ms"]
+        )
+
+        setup_test_environment()
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            user = self.create_data(options["favorites"], options["reviews"])
+            results = {
+                endpoint: self.run_endpoint(
+                    endpoint, user, options["requests"], options["concurrency"]
+                )
+                for endpoint in options["endpoints"]
+            }
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(
+                old_database_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        self.report(results)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump(
+                    {"results": results, "cache": cache_stats.snapshot()},
+                    file,
+                    indent=2,
+                )
+
+    def create_data(self, favorites, reviews):
+        user, created = User.objects.get_or_create(username="load-test")
+        places, created_place_ids = Place.objects.get_or_create_many(
+            [
+                f"fake-load-test-{index}"
+                for index in range(max(favorites, reviews))
+            ]
+        )
+        places = list(places.values())
+        FavoritePlace.objects.bulk_create(
+            [
+                FavoritePlace(user=user, place=place)
+                for place in places[:favorites]
+            ],
+            ignore_conflicts=True,
+        )
+        PlaceReview.objects.bulk_create(
+            [
+                PlaceReview(
+                    user=user,
+                    place=places[index % len(places)],
+                    rating=4.5,
+                    text=f"Review {index}",
+                )
+                for index in range(reviews)
+            ]
+        )
+        return user
+
+    def run_endpoint(self, endpoint, user, request_count, concurrency):
+        method, path, body = ENDPOINTS[endpoint]
+        indices = queue.Queue()
+        for index in range(request_count):
+            indices.put(index)
+        samples = []
+        samples_lock = threading.Lock()
+
+        def worker():
+            client = Client()
+            client.force_login(user)
+            try:
+                while True:
+                    try:
+                        index = indices.get_nowait()
+                    except queue.Empty:
+                        return
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        if method == "post":
+                            response = client.post(
+                                path,
+                                body(index),
+                                content_type="application/json",
+                            )
+                        else:
+                            response = client.get(
+                                path, body(index) if body else None
+                            )
+                        elapsed = time.perf_counter() - start
+                    with samples_lock:
+                        samples.append(
+                            (
+                                elapsed,
+                                len(queries.captured_queries),
+                                self.is_error(response),
+                            )
+                        )
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - start
+
+        # Failed requests are counted but kept out of the latencies, an
+        # endpoint that fails fast would otherwise look fast
+        latencies = sorted(
+            elapsed * 1000
+            for elapsed, query_count, error in samples
+            if not error
+        )
+        query_counts = [query_count for elapsed, query_count, error in samples]
+        return {
+            "requests": len(samples),
+            "errors": sum(error for elapsed, query_count, error in samples),
+            "p50_ms": percentile(latencies, 0.50) if latencies else None,
+            "p95_ms": percentile(latencies, 0.95) if latencies else None,
+            "p99_ms": percentile(latencies, 0.99) if latencies else None,
+            "requests_per_second": len(samples) / wall_seconds,
+            "queries_mean": (
+                statistics.mean(query_counts) if query_counts else None
+            ),
+            "queries_max": max(query_counts) if query_counts else None,
+        }
+
+    def is_error(self, response):
+        if response.status_code != 200:
+            return True
+        body = response.json()
+        # The APIs report failures as {"status": ..., "msg": ...} with HTTP 200
+        return isinstance(body, dict) and body.get("status", 200) >= 400
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<30}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>8}"
+            f"{'queries':>9}{'max':>5}"
+        )
+        for endpoint, result in results.items():
+            if result["p50_ms"] is None:
+                self.stdout.write(
+                    f"{endpoint:<30}{result['requests']:>9}{result['errors']:>8}  no successful samples"
+                )
+                continue
+            self.stdout.write(
+                f"{endpoint:<30}{result['requests']:>9}{result['errors']:>8}{result['p50_ms']:>9.1f}"
+                f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['requests_per_second']:>8.1f}"
+                f"{result['queries_mean']:>9.1f}{result['queries_max']:>5}"
+            )
+        self.stdout.write(
+            f"Google cache hits/misses: {cache_stats.snapshot()}"
+        )
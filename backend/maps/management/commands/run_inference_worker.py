@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from maps.inference import InferenceServer
+
+
+class Command(BaseCommand):
+    help = "Runs the shared cuisine inference worker that micro-batches predictions from every web worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket", default=settings.CUISINE_INFERENCE_SOCKET
+        )
+        parser.add_argument(
+            "--max-batch-size",
+            type=int,
+            default=settings.CUISINE_INFERENCE_MAX_BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--max-wait-ms",
+            type=float,
+            default=settings.CUISINE_INFERENCE_MAX_WAIT_MS,
+        )
+
+    def handle(self, *args, **options):
+        if not options["socket"]:
+            raise CommandError("Pass --socket or set CUISINE_INFERENCE_SOCKET")
+
+        self.stdout.write(
+            f"Serving cuisine predictions on {options['socket']} "
+            f"(max batch size {options['max_batch_size']}, max wait {options['max_wait_ms']} ms)"
+        )
+        InferenceServer(
+            options["socket"],
+            options["max_batch_size"],
+            options["max_wait_ms"],
+        ).serve_forever()
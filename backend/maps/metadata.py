@@ -0,0 +1,50 @@
+from . import async_gateway
+from .gateway import fetch_place_details
+from .models import Place
+
+
+def stale_places(places, force):
+    return [place for place in places if force or place.is_metadata_stale()]
+
+
+def apply_place_details(places, place_results):
+    refreshed = []
+    for place, place_result in zip(places, place_results):
+        # A failed lookup keeps whatever snapshot the place already has
+        if place_result is not None:
+            place.update_metadata(place_result)
+            refreshed.append(place)
+    return refreshed
+
+
+def refresh_place_metadata(places, force=False):
+    """
+    Makes sure every place has a fresh name/address/maps URL snapshot. Missing
+    or stale snapshots are fetched in one bounded parallel batch and saved with
+    a single bulk_update, fresh ones cost nothing.
+    """
+    places = stale_places(places, force)
+    if len(places) == 0:
+        return
+
+    refreshed = apply_place_details(
+        places,
+        fetch_place_details([place.google_place_id for place in places]),
+    )
+    if len(refreshed) > 0:
+        Place.objects.bulk_update(refreshed, Place.METADATA_FIELDS)
+
+
+async def arefresh_place_metadata(places, force=False):
+    places = stale_places(places, force)
+    if len(places) == 0:
+        return
+
+    refreshed = apply_place_details(
+        places,
+        await async_gateway.fetch_place_details(
+            [place.google_place_id for place in places]
+        ),
+    )
+    if len(refreshed) > 0:
+        await Place.objects.abulk_update(refreshed, Place.METADATA_FIELDS)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maps", "0005_alter_placereview_place_alter_placereview_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="cuisine_model_version",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="cuisine_source_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="predicted_cuisines",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
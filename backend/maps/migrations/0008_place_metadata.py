@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maps", "0007_geocoderesult"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="address",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="google_maps_url",
+            field=models.URLField(blank=True, default="", max_length=500),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="metadata_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="name",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maps", "0008_place_metadata"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="placereview",
+            index=models.Index(
+                fields=["user", "-timestamp", "-id"],
+                name="placereview_user_timestamp",
+            ),
+        ),
+    ]
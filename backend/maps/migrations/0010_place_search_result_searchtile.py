@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maps", "0009_placereview_user_timestamp"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="place",
+            name="business_status",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="geohash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="rating",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="search_result_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="place",
+            name="types",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name="SearchTile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("geohash", models.CharField(max_length=12)),
+                ("query_digest", models.CharField(max_length=64)),
+                ("searched_at", models.DateTimeField()),
+                (
+                    "places",
+                    models.ManyToManyField(
+                        blank=True,
+                        related_name="search_tiles",
+                        to="maps.place",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("geohash", "query_digest"),
+                        name="unique_search_tile",
+                    )
+                ],
+            },
+        ),
+    ]
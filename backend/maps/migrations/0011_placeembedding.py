@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maps", "0010_place_search_result_searchtile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaceEmbedding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("vector", models.BinaryField()),
+                ("model_version", models.CharField(max_length=100)),
+                ("source_hash", models.CharField(max_length=64)),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "place",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="embedding",
+                        to="maps.place",
+                    ),
+                ),
+            ],
+        ),
+    ]
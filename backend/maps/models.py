@@ -1,7 +1,12 @@
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from . import geohash
+from .address import parse_address
 
 
 def is_valid_rating(value):
@@ -12,8 +17,104 @@ def is_valid_rating(value):
         raise ValidationError("Rating must be between 1 and 5 with only half steps allowed.")
 
 
+class PlaceQuerySet(models.QuerySet):
+    def get_or_create_many(self, google_place_ids):
+        """
+        Bulk get_or_create keyed on google_place_id. Runs a constant number of queries however many ids are passed and
+        returns a {google_place_id: Place} dict together with the set of ids that had to be created.
+        """
+        places = {place.google_place_id: place for place in self.filter(google_place_id__in=google_place_ids)}
+
+        missing_google_place_ids = [
+            google_place_id for google_place_id in dict.fromkeys(google_place_ids) if google_place_id not in places
+        ]
+        if len(missing_google_place_ids) > 0:
+            self.model.objects.bulk_create(
+                [self.model(google_place_id=google_place_id) for google_place_id in missing_google_place_ids],
+                ignore_conflicts=True,
+            )
+            # bulk_create cannot return primary keys when conflicts are ignored, so the new rows are read back. They have
+            # no related rows yet, which is why this read skips any prefetches set on this queryset.
+            for place in self.model.objects.filter(google_place_id__in=missing_google_place_ids):
+                places[place.google_place_id] = place
+
+        return places, set(missing_google_place_ids)
+
+
 class Place(models.Model):
+    objects = PlaceQuerySet.as_manager()
+
     google_place_id = models.CharField(max_length=100, unique=True)
+    predicted_cuisines = models.JSONField(blank=True, default=list)
+    cuisine_model_version = models.CharField(max_length=100, blank=True, default="")
+    cuisine_source_hash = models.CharField(max_length=64, blank=True, default="")
+    # Snapshot of the Place Details fields shown on the profile page, refreshed once it is older than PLACE_METADATA_TTL
+    name = models.CharField(max_length=255, blank=True, default="")
+    address = models.JSONField(blank=True, default=dict)
+    google_maps_url = models.URLField(max_length=500, blank=True, default="")
+    metadata_updated_at = models.DateTimeField(null=True, blank=True)
+    # Fields of the last text-search hit for this place, which let the local index answer searches without Google
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True)
+    rating = models.FloatField(null=True, blank=True)
+    business_status = models.CharField(max_length=32, blank=True, default="")
+    types = models.JSONField(blank=True, default=list)
+    search_result_updated_at = models.DateTimeField(null=True, blank=True)
+
+    METADATA_FIELDS = ["name", "address", "google_maps_url", "metadata_updated_at"]
+    SEARCH_RESULT_FIELDS = [
+        "name",
+        "latitude",
+        "longitude",
+        "geohash",
+        "rating",
+        "business_status",
+        "types",
+        "search_result_updated_at",
+    ]
+
+    def is_metadata_stale(self):
+        return (
+            self.metadata_updated_at is None
+            or (timezone.now() - self.metadata_updated_at).total_seconds() > settings.PLACE_METADATA_TTL
+        )
+
+    def is_search_result_stale(self):
+        return (
+            self.search_result_updated_at is None
+            or (timezone.now() - self.search_result_updated_at).total_seconds() > settings.PLACE_METADATA_TTL
+        )
+
+    def update_metadata(self, place_result):
+        self.name = place_result.get("name") or ""
+        self.address = parse_address(place_result.get("adr_address", ""))
+        self.google_maps_url = place_result.get("url") or ""
+        self.metadata_updated_at = timezone.now()
+
+    def update_search_result(self, place):
+        location = place["geometry"]["location"]
+        self.latitude = location["lat"]
+        self.longitude = location["lng"]
+        self.geohash = geohash.encode(location["lat"], location["lng"], precision=12)
+        self.rating = place.get("rating")
+        self.business_status = place.get("business_status") or ""
+        self.types = place.get("types") or []
+        self.search_result_updated_at = timezone.now()
+        self.name = place.get("name") or self.name
+
+    def to_search_result(self):
+        """
+        The text-search hit this place was last seen as, with the fields search_for_restaurants reads
+        """
+        return {
+            "place_id": self.google_place_id,
+            "name": self.name,
+            "geometry": {"location": {"lat": self.latitude, "lng": self.longitude}},
+            "rating": self.rating,
+            "business_status": self.business_status,
+            "types": self.types,
+        }
 
 
 class PlaceReview(models.Model):
@@ -22,3 +123,45 @@ class PlaceReview(models.Model):
     rating = models.FloatField(validators=[MinValueValidator(1.0), MaxValueValidator(5.0), is_valid_rating])
     text = models.TextField(max_length=300)
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-timestamp", "-id"], name="placereview_user_timestamp")]
+
+
+class GeocodeResult(models.Model):
+    """
+    Geocoding results keyed on the normalized address. A row without coordinates records that Google found nothing.
+    """
+
+    normalized_address = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class PlaceEmbedding(models.Model):
+    """
+    Normalized sentence embedding of the text a place's cuisines are predicted from, the vectors behind semantic search
+    """
+
+    place = models.OneToOneField(Place, on_delete=models.CASCADE, related_name="embedding")
+    # float32 vector as raw bytes
+    vector = models.BinaryField()
+    model_version = models.CharField(max_length=100)
+    source_hash = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class SearchTile(models.Model):
+    """
+    A geohash cell that a Google text search for one query has covered, together with the places it returned there.
+    Searches for the same query whose circle only overlaps fresh tiles are answered from these places.
+    """
+
+    geohash = models.CharField(max_length=12)
+    query_digest = models.CharField(max_length=64)
+    places = models.ManyToManyField(Place, blank=True, related_name="search_tiles")
+    searched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["geohash", "query_digest"], name="unique_search_tile")]
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import googlemaps
+from core.metrics import google_api_seconds
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(googlemaps.exceptions.TransportError):
+    """
+    Raised instead of calling Google while the circuit breaker is open. It is a
+    TransportError so that every caller that already copes with Google being
+    unreachable copes with it too.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens are added per second up to capacity,
+    and every call takes one
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token and returns how many seconds the caller has to wait
+        before using it
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate,
+            )
+            self.updated_at = now
+            self.tokens -= 1
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and then fails fast for
+    reset_timeout seconds. After that a single trial call is let through, which
+    closes the circuit when it succeeds and opens it again when it fails.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if (
+                time.monotonic() - self.opened_at < self.reset_timeout
+                or self.trial_in_flight
+            ):
+                raise CircuitOpen("Google Maps circuit breaker is open")
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        "Opening the Google Maps circuit breaker after %d failures",
+                        self.failures,
+                    )
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None
+
+
+def is_retriable(error):
+    """
+    Quota errors, 5xx responses, timeouts and connection errors are worth
+    retrying, anything else (NOT_FOUND, INVALID_REQUEST, ...) would fail again
+    """
+    if isinstance(error, CircuitOpen):
+        return False
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status == "OVER_QUERY_LIMIT"
+    if isinstance(error, googlemaps.exceptions.HTTPError):
+        return error.status_code >= 500
+    return isinstance(
+        error,
+        (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError),
+    )
+
+
+def backoff_delay(attempt):
+    """
+    Full jitter: a random delay up to an exponentially growing cap
+    """
+    return random.uniform(
+        0,
+        min(
+            settings.GOOGLE_MAPS_RETRY_MAX_DELAY,
+            settings.GOOGLE_MAPS_RETRY_BASE_DELAY * 2**attempt,
+        ),
+    )
+
+
+rate_limiter = TokenBucket(
+    settings.GOOGLE_MAPS_QPS, settings.GOOGLE_MAPS_BURST
+)
+circuit_breaker = CircuitBreaker(
+    settings.GOOGLE_MAPS_BREAKER_FAILURE_THRESHOLD,
+    settings.GOOGLE_MAPS_BREAKER_RESET_TIMEOUT,
+)
+
+
+def call_google(api, fn, *args, **kwargs):
+    """
+    Runs one Google Maps call behind the shared rate limiter and circuit
+    breaker, retrying retriable errors with jittered exponential backoff. Its
+    duration, retries included, is recorded per api in google_api_seconds.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        circuit_breaker.before_call()
+        for attempt in range(settings.GOOGLE_MAPS_MAX_RETRIES + 1):
+            rate_limiter.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as error:
+                if not is_retriable(error):
+                    circuit_breaker.record_success()
+                    raise
+                if attempt == settings.GOOGLE_MAPS_MAX_RETRIES:
+                    circuit_breaker.record_failure()
+                    raise
+                time.sleep(backoff_delay(attempt))
+            else:
+                circuit_breaker.record_success()
+                outcome = "ok"
+                return result
+    finally:
+        google_api_seconds.observe(
+            time.perf_counter() - start, api=api, outcome=outcome
+        )
+
+
+async def acall_google(api, coroutine_function, *args, **kwargs):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        circuit_breaker.before_call()
+        for attempt in range(settings.GOOGLE_MAPS_MAX_RETRIES + 1):
+            await rate_limiter.aacquire()
+            try:
+                result = await coroutine_function(*args, **kwargs)
+            except Exception as error:
+                if not is_retriable(error):
+                    circuit_breaker.record_success()
+                    raise
+                if attempt == settings.GOOGLE_MAPS_MAX_RETRIES:
+                    circuit_breaker.record_failure()
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+            else:
+                circuit_breaker.record_success()
+                outcome = "ok"
+                return result
+    finally:
+        google_api_seconds.observe(
+            time.perf_counter() - start, api=api, outcome=outcome
+        )
+
+
+def is_unavailable(error):
+    """
+    Whether an error means Google could not answer, as opposed to Google
+    answering with an error
+    """
+    return isinstance(error, CircuitOpen) or is_retriable(error)
@@ -1,11 +1,21 @@
-from ninja import Schema
+from ninja import Field, Schema
 
 
 class SearchParams(Schema):
     location: dict[str, float]
-    location_name: str
+    # Geocoded location names are stored in GeocodeResult.normalized_address, which holds up to 255 characters
+    location_name: str = Field(max_length=255)
     cuisine_type: str
     restaurant_name: str
     query: str
-    radius: int
+    # Google's Places API does not search further than 50km
+    radius: int = Field(gt=0, le=50000)
     rating: float
+
+
+class SemanticSearchParams(Schema):
+    query: str
+    location: dict[str, float]
+    radius: int
+    rating: float = 0
+    limit: int = 20
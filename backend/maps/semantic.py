@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .cuisines import embedding_model_version, source_text_hash
+from .local_index import EARTH_RADIUS_METERS
+from .models import PlaceEmbedding
+
+
+class PlaceEmbeddingIndex:
+    """
+    Every stored place embedding in one numpy matrix, next to arrays of each
+    place's location, rating and status, so that a query is a vectorized
+    radius/rating mask and a single matrix-vector product. Embeddings stored by
+    this process are added as they are saved, those stored by other processes
+    are picked up every SEMANTIC_INDEX_REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.arrays = None
+        self.updated_at = None
+        self.refreshed_at = None
+
+    def add(self, place_embeddings):
+        with self.lock:
+            for place_embedding in place_embeddings:
+                place = place_embedding.place
+                if place.latitude is None:
+                    continue
+                self.entries[place_embedding.place_id] = (
+                    np.frombuffer(place_embedding.vector, dtype=np.float32),
+                    place.latitude,
+                    place.longitude,
+                    place.rating or 0,
+                    place.business_status == "OPERATIONAL",
+                )
+            self.arrays = None
+
+    def refresh(self):
+        interval = settings.SEMANTIC_INDEX_REFRESH_INTERVAL
+        if (
+            self.refreshed_at is not None
+            and time.monotonic() - self.refreshed_at < interval
+        ):
+            return
+
+        self.refreshed_at = time.monotonic()
+        refresh_started_at = timezone.now()
+        place_embeddings = PlaceEmbedding.objects.filter(
+            model_version=embedding_model_version()
+        ).select_related("place")
+        if self.updated_at is not None:
+            # The windows overlap so that rows committed a little after they
+            # were stamped are not missed
+            place_embeddings = place_embeddings.filter(
+                updated_at__gte=self.updated_at - timedelta(seconds=interval)
+            )
+        self.add(list(place_embeddings))
+        self.updated_at = refresh_started_at
+
+    def get_arrays(self):
+        with self.lock:
+            if self.arrays is None and len(self.entries) > 0:
+                place_ids = list(self.entries)
+                vectors, latitudes, longitudes, ratings, operational = zip(
+                    *self.entries.values()
+                )
+                self.arrays = (
+                    np.array(place_ids),
+                    np.stack(vectors),
+                    np.radians(latitudes),
+                    np.radians(longitudes),
+                    np.array(ratings),
+                    np.array(operational),
+                )
+            return self.arrays
+
+    def search(self, query_vector, location, radius, rating, limit):
+        """
+        Returns (Place id, cosine similarity) pairs of the places within radius
+        meters of location rated at least rating, most similar first
+        """
+        self.refresh()
+        arrays = self.get_arrays()
+        if arrays is None:
+            return []
+
+        place_ids, vectors, latitudes, longitudes, ratings, operational = (
+            arrays
+        )
+        latitude, longitude = np.radians(location["lat"]), np.radians(
+            location["lng"]
+        )
+        a = (
+            np.sin((latitudes - latitude) / 2) ** 2
+            + np.cos(latitude)
+            * np.cos(latitudes)
+            * np.sin((longitudes - longitude) / 2) ** 2
+        )
+        distances = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+        # Unrated places pass the rating filter, like in filter_search_results
+        candidates = np.flatnonzero(
+            (distances <= radius)
+            & ((ratings >= rating) | (ratings == 0))
+            & operational
+        )
+        if len(candidates) == 0:
+            return []
+
+        scores = vectors[candidates] @ query_vector
+        top = np.argpartition(-scores, min(limit, len(scores)) - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(place_ids[candidates[index]]), float(scores[index]))
+            for index in top
+        ]
+
+
+place_embedding_index = PlaceEmbeddingIndex()
+
+
+def find_stale_place_embeddings(places_with_text):
+    """
+    Takes (Place, source text) pairs and returns the pairs whose stored
+    embedding is missing or was made from a different text or model
+    """
+    model_version = embedding_model_version()
+    stored = {
+        place_embedding.place_id: place_embedding
+        for place_embedding in PlaceEmbedding.objects.filter(
+            place__in=[place for place, text in places_with_text]
+        ).only("place_id", "model_version", "source_hash")
+    }
+    return [
+        (place, text)
+        for place, text in places_with_text
+        if place.id not in stored
+        or stored[place.id].model_version != model_version
+        or stored[place.id].source_hash != source_text_hash(text)
+    ]
+
+
+def save_place_embeddings(places_with_text, vectors):
+    """
+    Stores the embeddings of (Place, source text) pairs, as returned by
+    embed_descriptions, and adds them to the index
+    """
+    if len(places_with_text) == 0:
+        return
+
+    model_version = embedding_model_version()
+    now = timezone.now()
+    place_embeddings = [
+        PlaceEmbedding(
+            place=place,
+            vector=vector.tobytes(),
+            model_version=model_version,
+            source_hash=source_text_hash(text),
+            updated_at=now,
+        )
+        for (place, text), vector in zip(places_with_text, vectors)
+    ]
+    PlaceEmbedding.objects.bulk_create(
+        place_embeddings,
+        update_conflicts=True,
+        unique_fields=["place"],
+        update_fields=["vector", "model_version", "source_hash", "updated_at"],
+    )
+    place_embedding_index.add(place_embeddings)
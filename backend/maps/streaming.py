@@ -0,0 +1,55 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_event(stream_format, event, data):
+    """
+    NDJSON gets one {"event", "data"} object per line, SSE gets a named event
+    per message
+    """
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+    return (
+        json.dumps({"event": event, "data": data}, cls=DjangoJSONEncoder)
+        + "\n"
+    )
+
+
+async def aiter_messages(messages):
+    """
+    Pulls each message of a sync generator in the thread sync views run in, so
+    that its ORM and Google calls never block the event loop
+    """
+    messages = iter(messages)
+    done = object()
+    while (message := await sync_to_async(next)(messages, done)) is not done:
+        yield message
+
+
+def stream_events(request, stream_format, events):
+    """
+    Wraps a generator of (event, data) pairs in a response that is flushed to
+    the client message by message. Under ASGI, Django buffers the whole of a
+    sync iterator before sending it, so ASGI requests get an async one.
+    """
+    messages = (
+        encode_event(stream_format, event, data) for event, data in events
+    )
+    if isinstance(request, ASGIRequest):
+        messages = aiter_messages(messages)
+    response = StreamingHttpResponse(
+        messages, content_type=STREAM_FORMATS[stream_format]
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stops nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
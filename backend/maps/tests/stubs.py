@@ -0,0 +1,101 @@
+import sys
+import tempfile
+import types
+import zlib
+from unittest import mock
+
+import torch
+from django.test import override_settings
+
+from maps import cuisines
+
+EMBEDDING_DIMENSIONS = 64
+
+
+class StubSentenceTransformer(torch.nn.Module):
+    """
+    Deterministic stand-in for SentenceTransformer: a text is embedded as its
+    bag of hashed words passed through one Linear layer, so texts that share
+    words are close and torch-int8 quantization has a layer to quantize.
+    With backend="onnx" the weights are rounded to float16, so the parity
+    check compares two slightly different models, as it does for the real
+    exported one. Every batch it encodes is kept in encoded_batches.
+    """
+
+    def __init__(self, model_name_or_path=None, device=None, backend=None):
+        super().__init__()
+        generator = torch.Generator().manual_seed(0)
+        self.linear = torch.nn.Linear(
+            EMBEDDING_DIMENSIONS, EMBEDDING_DIMENSIONS
+        )
+        with torch.no_grad():
+            self.linear.weight.copy_(
+                torch.eye(EMBEDDING_DIMENSIONS)
+                + 0.1
+                * torch.randn(
+                    EMBEDDING_DIMENSIONS,
+                    EMBEDDING_DIMENSIONS,
+                    generator=generator,
+                )
+            )
+            self.linear.bias.zero_()
+            if backend == "onnx":
+                self.linear.weight.copy_(self.linear.weight.half().float())
+        self.encoded_batches = []
+
+    @property
+    def device(self):
+        return torch.device("cpu")
+
+    def encode(
+        self, texts, convert_to_tensor=False, normalize_embeddings=False
+    ):
+        self.encoded_batches.append(list(texts))
+        features = torch.zeros(len(texts), EMBEDDING_DIMENSIONS)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(",", " ").split():
+                features[
+                    row, zlib.crc32(word.encode()) % EMBEDDING_DIMENSIONS
+                ] += 1
+        with torch.no_grad():
+            embeddings = self.linear(features)
+        if normalize_embeddings:
+            embeddings = torch.nn.functional.normalize(embeddings, dim=1)
+        return embeddings
+
+
+def use_stub_model(test_case):
+    """
+    Makes maps.cuisines load StubSentenceTransformer instead of the real model
+    for the duration of test_case, with the cuisine label embeddings stored in
+    a temporary directory. Returns that directory.
+    """
+    sentence_transformers = types.ModuleType("sentence_transformers")
+    sentence_transformers.SentenceTransformer = StubSentenceTransformer
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+
+    for patcher in [
+        mock.patch.dict(
+            sys.modules, {"sentence_transformers": sentence_transformers}
+        ),
+        mock.patch.object(cuisines, "model", None),
+        mock.patch.object(cuisines, "cuisine_embeddings", None),
+    ]:
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+
+    settings_override = override_settings(
+        CUISINE_EMBEDDINGS_DIR=directory.name
+    )
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return directory.name
+
+
+def encoded_batches():
+    """
+    Batches the stub model has encoded since it was loaded
+    """
+    model, cuisine_embeddings = cuisines.get_model()
+    return model.encoded_batches
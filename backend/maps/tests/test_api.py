@@ -0,0 +1,116 @@
+import json
+from base64 import urlsafe_b64encode
+from unittest import mock
+
+from core.query_budget import assert_query_budget
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from maps.api import search_digest
+from maps.gateway import cache, gmaps
+from maps.resilience import CircuitOpen
+from maps.schemas import SearchParams
+
+from .stubs import use_stub_model
+
+ROUTE = "maps/api/search_for_restaurants"
+SEARCH = {
+    "location": {"lat": 33.7756, "lng": -84.3963},
+    "location_name": "Atlanta, GA",
+    "cuisine_type": "Pizza",
+    "restaurant_name": "",
+    "query": "cuisine_type",
+    "radius": 1000,
+    "rating": 0,
+}
+
+
+class PlaceDetailsTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        cache.clear()
+        self.client.force_login(User.objects.create(username="details"))
+
+    def test_generated_places_are_found_where_their_id_says(self):
+        response = self.client.get(
+            "/maps/api/place_details", {"place_id": "fake-33.774--84.3979-0"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        place = response.json()["place"]
+        self.assertEqual(
+            place["location"], {"latitude": 33.774, "longitude": -84.3979}
+        )
+
+    def test_google_being_unavailable_is_a_503(self):
+        with mock.patch(
+            "maps.api.get_place_details", side_effect=CircuitOpen()
+        ):
+            response = self.client.get(
+                "/maps/api/place_details", {"place_id": "fake-0-0-0"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], 503)
+
+
+class SearchCursorTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        cache.clear()
+        self.client.force_login(User.objects.create(username="cursor"))
+
+    def search_page(self, cursor):
+        response = self.client.post(
+            "/maps/api/paginated/search_for_restaurants?cursor=" + cursor,
+            SEARCH,
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def encode(self, payload):
+        return urlsafe_b64encode(payload).decode()
+
+    def test_a_cursor_that_is_not_json_is_a_bad_request(self):
+        self.assertEqual(self.search_page(self.encode(b"abc"))["status"], 400)
+
+    def test_a_cursor_with_a_non_integer_page_is_a_bad_request(self):
+        cursor = {"search": search_digest(SearchParams(**SEARCH)), "page": "x"}
+
+        response = self.search_page(self.encode(json.dumps(cursor).encode()))
+
+        self.assertEqual(response["status"], 400)
+
+
+class SearchQueryBudgetTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        cache.clear()
+        self.client.force_login(User.objects.create(username="budget"))
+
+    def search(self, cuisine_type="Pizza"):
+        response = self.client.post(
+            "/maps/api/search_for_restaurants",
+            {**SEARCH, "cuisine_type": cuisine_type},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def warm_search_query_count(self, results, cuisine_type):
+        with mock.patch.object(gmaps.client, "results_per_search", results):
+            self.search(cuisine_type)
+            with assert_query_budget(ROUTE) as profile:
+                self.assertEqual(len(self.search(cuisine_type)), results)
+        return profile.count
+
+    def test_a_cold_search_stays_within_budget(self):
+        with assert_query_budget(ROUTE):
+            self.search()
+
+    def test_warm_search_query_count_does_not_grow_with_the_results(self):
+        self.assertEqual(
+            self.warm_search_query_count(3, "Ramen"),
+            self.warm_search_query_count(20, "Sushi"),
+        )
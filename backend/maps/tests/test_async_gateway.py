@@ -0,0 +1,52 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+
+from maps import async_gateway
+
+from .stubs import use_stub_model
+
+
+class RequestClientTests(TestCase):
+    def test_wsgi_requests_close_their_client(self):
+        @async_gateway.with_client
+        async def view(request):
+            return async_gateway.get_client(), async_gateway.get_client()
+
+        request = RequestFactory().get("/")
+        first, same = async_to_sync(view)(request)
+        second, _ = async_to_sync(view)(request)
+
+        self.assertIs(first, same)
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertTrue(second.is_closed)
+        self.assertEqual(len(async_gateway.clients), 0)
+
+    def test_requests_that_do_not_call_google_build_no_client(self):
+        @async_gateway.with_client
+        async def view(request):
+            return async_gateway.request_clients.get()
+
+        self.assertEqual(async_to_sync(view)(RequestFactory().get("/")), [])
+
+    def test_decorated_endpoints_still_read_their_parameters(self):
+        use_stub_model(self)
+        self.client.force_login(User.objects.create(username="async"))
+
+        response = self.client.post(
+            "/maps/api/async/search_for_restaurants",
+            {
+                "location": {"lat": 33.7756, "lng": -84.3963},
+                "location_name": "",
+                "cuisine_type": "Pizza",
+                "restaurant_name": "",
+                "query": "cuisine_type",
+                "radius": 1000,
+                "rating": 0,
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 20)
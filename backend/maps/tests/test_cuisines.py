@@ -0,0 +1,158 @@
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import torch
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from maps import cuisines
+from maps.models import Place
+
+from .stubs import StubSentenceTransformer, encoded_batches, use_stub_model
+
+
+class LabelEmbeddingsArtifactTests(TestCase):
+    def setUp(self):
+        self.directory = use_stub_model(self)
+
+    def reload_model(self):
+        cuisines.model = None
+        cuisines.cuisine_embeddings = None
+        return cuisines.get_model()
+
+    def test_label_embeddings_are_encoded_once_and_reused(self):
+        model, cuisine_embeddings = cuisines.get_model()
+        self.assertEqual(encoded_batches(), [cuisines.CUISINE_TYPES])
+        self.assertTrue(cuisines.cuisine_embeddings_path().exists())
+
+        reloaded_model, reloaded_embeddings = self.reload_model()
+
+        self.assertEqual(reloaded_model.encoded_batches, [])
+        self.assertTrue(torch.equal(reloaded_embeddings, cuisine_embeddings))
+
+    def test_changing_the_labels_invalidates_the_artifact(self):
+        cuisines.get_model()
+        path = cuisines.cuisine_embeddings_path()
+
+        with mock.patch.object(
+            cuisines, "cuisine_types_hash", return_value="other-labels"
+        ):
+            self.assertNotEqual(cuisines.cuisine_embeddings_path(), path)
+            model, cuisine_embeddings = self.reload_model()
+
+        self.assertEqual(model.encoded_batches, [cuisines.CUISINE_TYPES])
+
+    def test_changing_the_backend_or_model_invalidates_the_artifact(self):
+        path = cuisines.cuisine_embeddings_path()
+
+        with override_settings(CUISINE_INFERENCE_BACKEND="torch-int8"):
+            self.assertNotEqual(cuisines.cuisine_embeddings_path(), path)
+        with override_settings(CUISINE_MODEL_NAME="org/other-model"):
+            other_path = cuisines.cuisine_embeddings_path()
+            self.assertNotEqual(other_path, path)
+            self.assertEqual(other_path.parent, Path(self.directory))
+
+
+class CachedCuisinePredictionTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        self.pizzeria = Place.objects.create(google_place_id="pizzeria")
+        self.sushi_bar = Place.objects.create(google_place_id="sushi-bar")
+        self.places_with_text = [
+            (self.pizzeria, "Wood-fired pizza and pasta"),
+            (self.sushi_bar, "Fresh sushi and sashimi"),
+        ]
+
+    def description_batches(self):
+        return [
+            batch
+            for batch in encoded_batches()
+            if batch != cuisines.CUISINE_TYPES
+        ]
+
+    def test_stored_predictions_are_reused(self):
+        first = cuisines.predict_cached_cuisines(self.places_with_text)
+        second = cuisines.predict_cached_cuisines(self.places_with_text)
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            self.description_batches(),
+            [["Wood-fired pizza and pasta", "Fresh sushi and sashimi"]],
+        )
+        self.pizzeria.refresh_from_db()
+        self.assertEqual(self.pizzeria.predicted_cuisines, first[0])
+
+    def test_only_places_whose_text_changed_are_predicted_again(self):
+        cuisines.predict_cached_cuisines(self.places_with_text)
+        cuisines.predict_cached_cuisines(
+            [
+                (self.pizzeria, "Neapolitan pizza"),
+                (self.sushi_bar, "Fresh sushi and sashimi"),
+            ]
+        )
+
+        self.assertEqual(self.description_batches()[-1], ["Neapolitan pizza"])
+
+    def test_new_labels_make_every_prediction_stale(self):
+        cuisines.predict_cached_cuisines(self.places_with_text)
+
+        with mock.patch.object(
+            cuisines, "cuisine_types_hash", return_value="other-labels"
+        ):
+            stale = cuisines.find_stale_cuisine_predictions(
+                self.places_with_text
+            )
+
+        self.assertEqual(stale, self.places_with_text)
+
+
+class BackendParityTests(TestCase):
+    """
+    Runs the benchmark_cuisine_backends parity check on the stub model, so
+    that CI fails when a backend stops agreeing with full precision torch
+    """
+
+    def setUp(self):
+        use_stub_model(self)
+
+    def run_benchmark(self, backends):
+        call_command(
+            "benchmark_cuisine_backends",
+            backends=backends,
+            batch_size=4,
+            repeat=1,
+            stdout=StringIO(),
+        )
+
+    def test_quantized_backends_agree_with_torch(self):
+        self.run_benchmark(["torch", "torch-int8", "onnx"])
+
+    def test_the_stub_backends_are_different_models(self):
+        texts = ["Wood fired pizza", "Ramen and gyoza"]
+
+        torch_embeddings = StubSentenceTransformer().encode(texts)
+        for backend in ["torch-int8", "onnx"]:
+            with self.subTest(backend=backend):
+                embeddings = cuisines.load_model(backend).encode(texts)
+                self.assertFalse(torch.equal(embeddings, torch_embeddings))
+
+    def test_a_disagreeing_backend_fails_the_check(self):
+        def load_model(backend):
+            model = StubSentenceTransformer()
+            if backend == "onnx":
+                generator = torch.Generator().manual_seed(1)
+                with torch.no_grad():
+                    model.linear.weight.copy_(
+                        torch.randn(
+                            model.linear.weight.shape, generator=generator
+                        )
+                    )
+            return model
+
+        with mock.patch(
+            "maps.management.commands.benchmark_cuisine_backends.load_model",
+            side_effect=load_model,
+        ):
+            with self.assertRaisesMessage(CommandError, "onnx"):
+                self.run_benchmark(["onnx"])
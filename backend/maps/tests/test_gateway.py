@@ -0,0 +1,232 @@
+import threading
+import time
+from unittest import mock
+
+import googlemaps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from maps.api import SEARCH_TYPES, resolve_places
+from maps.gateway import (
+    SingleFlight,
+    cache,
+    cache_stats,
+    geocode,
+    get_place_details,
+    gmaps,
+    place_details_cache_key,
+    text_search,
+    text_search_cache_key,
+    text_search_page,
+)
+from maps.models import GeocodeResult
+
+ATLANTA = {"lat": 33.7756, "lng": -84.3963}
+
+
+def stats(name):
+    return cache_stats.snapshot().get(name, {"hits": 0, "misses": 0})
+
+
+class GoogleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_calls = {}
+        for method in ["place", "places", "geocode"]:
+            patcher = mock.patch.object(
+                gmaps.client, method, wraps=getattr(gmaps.client, method)
+            )
+            self.client_calls[method] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_place_details_are_served_from_the_cache(self):
+        before = stats("place_details")
+        first = get_place_details("fake-33.77-84.39-1")
+        second = get_place_details("fake-33.77-84.39-1")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.client_calls["place"].call_count, 1)
+        after = stats("place_details")
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_expired_field_group_refetches_the_place(self):
+        get_place_details("fake-33.77-84.39-1")
+        cache.delete(place_details_cache_key("fake-33.77-84.39-1", "hours"))
+        get_place_details("fake-33.77-84.39-1")
+
+        self.assertEqual(self.client_calls["place"].call_count, 2)
+
+    def test_nearby_text_searches_share_a_cache_entry(self):
+        text_search(ATLANTA, "pizza", 1000, SEARCH_TYPES)
+        # A few meters away, in the same geohash cell
+        text_search(
+            {"lat": ATLANTA["lat"] + 0.00001, "lng": ATLANTA["lng"]},
+            "pizza",
+            1000,
+            SEARCH_TYPES,
+        )
+        self.assertEqual(self.client_calls["places"].call_count, 1)
+
+        text_search(ATLANTA, "sushi", 1000, SEARCH_TYPES)
+        self.assertEqual(self.client_calls["places"].call_count, 2)
+
+    def test_geocodes_are_stored_by_normalized_address(self):
+        location = geocode("Atlanta, GA")
+        cache.clear()
+
+        self.assertEqual(geocode("  atlanta   GA "), location)
+        self.assertEqual(self.client_calls["geocode"].call_count, 1)
+        self.assertEqual(GeocodeResult.objects.count(), 1)
+
+
+class SingleFlightTests(TestCase):
+    def run_concurrently(self, flight, fn, count=5):
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(flight.do("key", fn))
+            except Exception as error:
+                outcomes.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_one_call(self):
+        calls = []
+
+        def fn():
+            calls.append(None)
+            # Long enough for every other thread to join this call
+            time.sleep(0.2)
+            return "result"
+
+        outcomes = self.run_concurrently(SingleFlight(), fn)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, ["result"] * 5)
+
+    def test_every_caller_gets_the_error(self):
+        error = ValueError("upstream failed")
+
+        def fn():
+            time.sleep(0.2)
+            raise error
+
+        outcomes = self.run_concurrently(SingleFlight(), fn)
+
+        self.assertEqual(outcomes, [error] * 5)
+
+    def test_a_finished_call_is_not_reused(self):
+        flight = SingleFlight()
+
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+        self.assertEqual(flight.do("key", lambda: 2), 2)
+
+
+class ResolvePlacesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="resolver")
+
+    def found_places(self, count):
+        found_places = []
+        for index in range(count):
+            place_id = f"fake-33.7-84.3-{count}-{index}"
+            place_result = gmaps.client.place_response(place_id)["result"]
+            place = {
+                "place_id": place_id,
+                "geometry": {"location": {"lat": 33.7, "lng": -84.3}},
+            }
+            found_places.append((place, place_result))
+        return found_places
+
+    def resolve_query_count(self, count):
+        found_places = self.found_places(count)
+        with CaptureQueriesContext(connection) as queries:
+            places, favorite_place_ids = resolve_places(
+                self.user, found_places
+            )
+        self.assertEqual(len(places), count)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_number_of_places(self):
+        self.assertEqual(
+            self.resolve_query_count(3), self.resolve_query_count(20)
+        )
+
+
+class TextSearchPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="pager")
+        self.client.force_login(self.user)
+        fake_places = gmaps.client.places
+
+        def places(page_token=None, **kwargs):
+            if page_token is not None:
+                raise googlemaps.exceptions.ApiError("INVALID_REQUEST")
+            return {**fake_places(**kwargs), "next_page_token": "token"}
+
+        patcher = mock.patch.object(gmaps.client, "places", side_effect=places)
+        self.places = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("maps.gateway.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def token_waits(self):
+        # The fake client sleeps too, for its (zero) latency
+        return self.sleep.call_args_list.count(
+            mock.call(settings.SEARCH_PAGE_TOKEN_DELAY)
+        )
+
+    def test_a_token_that_was_just_issued_is_retried(self):
+        with self.assertRaises(googlemaps.exceptions.ApiError):
+            text_search_page(ATLANTA, "pizza", 1000, SEARCH_TYPES, 1)
+
+        self.assertEqual(
+            self.places.call_count, 1 + settings.SEARCH_PAGE_TOKEN_RETRIES
+        )
+        self.assertEqual(
+            self.token_waits(), settings.SEARCH_PAGE_TOKEN_RETRIES - 1
+        )
+
+    def test_an_old_token_is_not_retried(self):
+        text_search(ATLANTA, "pizza", 1000, SEARCH_TYPES)
+        key = text_search_cache_key(ATLANTA, "pizza", 1000, SEARCH_TYPES)
+        cache.set(key, {**cache.get(key), "fetched_at": time.time() - 600})
+
+        with self.assertRaises(googlemaps.exceptions.ApiError):
+            text_search_page(ATLANTA, "pizza", 1000, SEARCH_TYPES, 1)
+
+        self.assertEqual(self.places.call_count, 2)
+        self.assertEqual(self.token_waits(), 0)
+
+    def test_an_expired_cursor_is_reported_as_gone(self):
+        search = {
+            "location": ATLANTA,
+            "location_name": "",
+            "cuisine_type": "Pizza",
+            "restaurant_name": "",
+            "query": "cuisine_type",
+            "radius": 1000,
+            "rating": 0,
+        }
+
+        response = self.client.post(
+            "/maps/api/paginated/search_for_restaurants?page=1",
+            search,
+            content_type="application/json",
+        )
+
+        self.assertEqual(
+            response.json(), {"status": 410, "msg": "Search cursor expired"}
+        )
@@ -0,0 +1,34 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from maps.management.commands.load_test import Command
+
+
+class LoadTestCommandTests(SimpleTestCase):
+    def test_at_least_one_request_is_required(self):
+        with self.assertRaisesMessage(
+            CommandError, "--requests must be at least 1"
+        ):
+            call_command("load_test", requests=0, stdout=StringIO())
+
+    def test_an_endpoint_without_successful_samples_is_reported(self):
+        stdout = StringIO()
+        command = Command(stdout=stdout)
+        command.report(
+            {
+                "place_details": {
+                    "requests": 3,
+                    "errors": 3,
+                    "p50_ms": None,
+                    "p95_ms": None,
+                    "p99_ms": None,
+                    "requests_per_second": 30.0,
+                    "queries_mean": 1,
+                    "queries_max": 1,
+                }
+            }
+        )
+
+        self.assertIn("no successful samples", stdout.getvalue())
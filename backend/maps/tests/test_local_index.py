@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from maps.api import SEARCH_TYPES
+from maps.gateway import cache, gmaps, search_query_digest
+from maps.local_index import local_text_search, record_text_search
+from maps.models import Place, SearchTile
+
+ATLANTA = {"lat": 33.7756, "lng": -84.3963}
+
+
+class LocalIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.query_digest = search_query_digest("pizza", SEARCH_TYPES)
+
+    def record(self, radius):
+        results = gmaps.client.places(
+            query="pizza", location=ATLANTA, radius=radius
+        )["results"]
+        record_text_search(ATLANTA, self.query_digest, radius, results)
+
+    def test_recorded_searches_are_answered_locally(self):
+        self.record(1000)
+
+        result = local_text_search(ATLANTA, self.query_digest, 1000)
+
+        self.assertIsNotNone(result)
+        self.assertTrue(SearchTile.objects.exists())
+
+    def test_wide_searches_bypass_the_local_index(self):
+        with self.assertNumQueries(6):
+            self.record(50000)
+
+        self.assertFalse(SearchTile.objects.exists())
+        self.assertTrue(Place.objects.filter(latitude__isnull=False).exists())
+        self.assertIsNone(local_text_search(ATLANTA, self.query_digest, 50000))
+
+    def test_radius_is_capped_at_googles_maximum(self):
+        self.client.force_login(User.objects.create(username="wide"))
+
+        response = self.client.post(
+            "/maps/api/search_for_restaurants",
+            {
+                "location": ATLANTA,
+                "location_name": "",
+                "cuisine_type": "Pizza",
+                "restaurant_name": "",
+                "query": "cuisine_type",
+                "radius": 50001,
+                "rating": 0,
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 422)
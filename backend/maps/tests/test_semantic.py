@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from maps import cuisines
+from maps.gateway import cache
+from maps.models import PlaceEmbedding
+from maps.semantic import PlaceEmbeddingIndex
+
+from .stubs import encoded_batches, use_stub_model
+
+ATLANTA = {"lat": 33.7756, "lng": -84.3963}
+
+
+@override_settings(LOCAL_SEARCH_ENABLED=False)
+class SemanticSearchTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        cache.clear()
+        index = PlaceEmbeddingIndex()
+        for target in ["maps.semantic", "maps.api"]:
+            patcher = mock.patch(f"{target}.place_embedding_index", index)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.force_login(User.objects.create(username="semantic"))
+
+    def search(self, url, params):
+        return self.client.post(
+            url, params, content_type="application/json"
+        ).json()
+
+    def search_for_restaurants(self):
+        return self.search(
+            "/maps/api/search_for_restaurants",
+            {
+                "location": ATLANTA,
+                "location_name": "",
+                "cuisine_type": "Pizza",
+                "restaurant_name": "",
+                "query": "cuisine_type",
+                "radius": 1000,
+                "rating": 0,
+            },
+        )
+
+    def description_batches(self):
+        return [
+            batch
+            for batch in encoded_batches()
+            if batch != cuisines.CUISINE_TYPES
+        ]
+
+    def test_searched_places_are_found_without_the_local_index(self):
+        places = self.search_for_restaurants()
+
+        matches = self.search(
+            "/maps/api/semantic_search",
+            {"query": "wood-fired pizza", "location": ATLANTA, "radius": 2000},
+        )
+
+        self.assertGreater(len(matches), 0)
+        self.assertLessEqual(
+            {match["place_id"] for match in matches},
+            {place["place_id"] for place in places},
+        )
+
+    def test_a_search_encodes_each_place_once(self):
+        places = self.search_for_restaurants()
+
+        batches = self.description_batches()
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0]), len(places))
+        self.assertEqual(PlaceEmbedding.objects.count(), len(places))
+
+        self.search_for_restaurants()
+        self.assertEqual(len(self.description_batches()), 1)
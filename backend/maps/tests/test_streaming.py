@@ -0,0 +1,56 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from .stubs import use_stub_model
+
+SEARCH = {
+    "location": {"lat": 33.7756, "lng": -84.3963},
+    "location_name": "",
+    "cuisine_type": "Pizza",
+    "restaurant_name": "",
+    "query": "cuisine_type",
+    "radius": 1000,
+    "rating": 0,
+}
+
+
+class StreamingSearchTests(TestCase):
+    def setUp(self):
+        use_stub_model(self)
+        self.user = User.objects.create(username="streamer")
+
+    def events(self, lines):
+        return [json.loads(line)["event"] for line in lines if line.strip()]
+
+    def test_wsgi_requests_get_a_sync_stream(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/maps/api/stream/search_for_restaurants",
+            SEARCH,
+            content_type="application/json",
+        )
+
+        self.assertFalse(response.is_async)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(self.events(lines)[-1], "done")
+
+    async def test_asgi_requests_get_an_async_stream(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            "/maps/api/stream/search_for_restaurants",
+            SEARCH,
+            content_type="application/json",
+        )
+
+        self.assertTrue(response.is_async)
+        lines = [
+            line.decode()
+            async for message in response.streaming_content
+            for line in message.splitlines()
+        ]
+        events = self.events(lines)
+        self.assertEqual(events.count("place"), 20)
+        self.assertEqual(events.count("enrichment"), 20)
+        self.assertEqual(events[-1], "done")
@@ -1,20 +1,138 @@
-import os
-import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timezone
 from http import HTTPStatus
+from typing import Optional
 
-import googlemaps
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.forms.models import model_to_dict
 from django.http import HttpRequest
+from maps import async_gateway
+from maps.metadata import arefresh_place_metadata, refresh_place_metadata
 from maps.models import Place, PlaceReview
 from ninja import NinjaAPI
 
-from .models import UserProfile
+from .models import FavoritePlace
 from .schemas import PlaceReviewSchema, PlaceSchema
 
 api = NinjaAPI(urls_namespace="users")
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-gmaps = googlemaps.Client(key=GOOGLE_API_KEY)
+REVIEWS_PAGE_SIZE = 50
+REVIEWS_MAX_PAGE_SIZE = 200
+
+
+def build_favorite_place_response(place):
+    return {
+        "google_place_id": place.google_place_id,
+        "place_name": place.name,
+        "place_address": place.address,
+        "google_maps_page": place.google_maps_url,
+    }
+
+
+def build_review_response(review, place):
+    return {
+        "google_place_id": place.google_place_id,
+        "place_name": place.name,
+        "place_address": place.address,
+        "google_maps_page": place.google_maps_url,
+        "rating": review.rating,
+        "text": review.text,
+        "timestamp": review.timestamp,
+    }
+
+
+def encode_reviews_cursor(review):
+    return urlsafe_b64encode(f"{review.timestamp.isoformat()}|{review.id}".encode()).decode()
+
+
+def decode_reviews_cursor(cursor):
+    """
+    Raises ValueError when the cursor was not produced by encode_reviews_cursor
+    """
+    try:
+        timestamp, review_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        timestamp, review_id = datetime.fromisoformat(timestamp), int(review_id)
+    except (ValueError, TypeError) as error:
+        # binascii.Error and UnicodeDecodeError are ValueErrors too
+        raise ValueError("Invalid cursor") from error
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp, review_id
+
+
+def reviews_page_queryset(user, cursor, limit):
+    """
+    Newest reviews first. Keyset pagination on (timestamp, id) keeps every page a single indexed range query, however
+    deep the client pages. One extra row is fetched to tell whether there is a next page.
+    """
+    reviews = user.reviews_for_user.select_related("place").order_by("-timestamp", "-id")
+    if cursor:
+        timestamp, review_id = decode_reviews_cursor(cursor)
+        reviews = reviews.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=review_id))
+    return reviews[: reviews_page_size(limit) + 1]
+
+
+def reviews_page_size(limit):
+    return max(1, min(limit, REVIEWS_MAX_PAGE_SIZE))
+
+
+def split_reviews_page(reviews, limit):
+    limit = reviews_page_size(limit)
+    if len(reviews) > limit:
+        return reviews[:limit], encode_reviews_cursor(reviews[limit - 1])
+    return reviews, None
+
+
+def unique_places(reviews):
+    """
+    select_related gives every review its own Place instance, so reviews of the same place are collapsed onto one
+    instance before the snapshots are refreshed
+    """
+    places = {}
+    for review in reviews:
+        review.place = places.setdefault(review.place_id, review.place)
+    return list(places.values())
+
+
+def build_reviews_response(user, reviews, next_cursor):
+    return {
+        "status": HTTPStatus.OK,
+        "user_id": user.id,
+        "username": user.username,
+        "reviews": [build_review_response(review, review.place) for review in reviews],
+        "next_cursor": next_cursor,
+    }
+
+
+def create_favorite_place(user, place):
+    """
+    Returns False when the user has already favorited the place. The unique (user, place) constraint decides, so
+    concurrent adds cannot both succeed, and the savepoint keeps a duplicate from breaking an enclosing transaction.
+    """
+    try:
+        with transaction.atomic():
+            FavoritePlace.objects.create(user=user, place=place)
+    except IntegrityError:
+        return False
+    return True
+
+
+def build_added_review_response(user, place_review):
+    return {
+        "status": HTTPStatus.OK,
+        "user_id": user.id,
+        "username": user.username,
+        "review": {
+            "place": model_to_dict(place_review.place),
+            "username": place_review.user.username,
+            "rating": place_review.rating,
+            "text": place_review.text,
+            "timestamp": place_review.timestamp,
+        },
+    }
 
 
 # @api.get("/account/confirm_email")
@@ -30,28 +148,16 @@ def get_favorite_places(request: HttpRequest):
     if not request.user.is_authenticated:
         return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
 
-    def parse_address(address_string):
-        pattern = r'<span class="([^"]+)">([^<]+)</span>'
-        matches = re.findall(pattern, address_string)
-        address_dict = {class_name.replace("-", "_"): content for class_name, content in matches}
-        return address_dict
-
-    profile = UserProfile.objects.get(user=request.user)
-
-    favorite_places = []
-    for place in profile.favorite_places:
-        place_result = gmaps.place(place_id=place["google_place_id"])["result"]
-        favorite_places.append({
-            "google_place_id": place["google_place_id"],
-            "place_name": place_result.get("name"),
-            "place_address": parse_address(place_result["adr_address"]),
-            "google_maps_page": place_result.get("url"),
-        })
+    places = [
+        favorite_place.place
+        for favorite_place in request.user.favorite_places.select_related("place").order_by("created_at")
+    ]
+    refresh_place_metadata(places)
 
     return {
         "status": HTTPStatus.OK,
-        "user_id": profile.user.id,
-        "favorite_places": favorite_places,
+        "user_id": request.user.id,
+        "favorite_places": [build_favorite_place_response(place) for place in places],
     }
 
 
@@ -63,24 +169,18 @@ def add_favorite_place(request: HttpRequest, params: PlaceSchema):
             "msg": "User must be authenticated for this method.",
         }
 
-    profile = UserProfile.objects.get(user=request.user)
     place, created = Place.objects.get_or_create(google_place_id=params.google_place_id)
 
-    if model_to_dict(place).get("google_place_id") in [
-        favorite_place.get("google_place_id") for favorite_place in profile.favorite_places
-    ]:
+    if not create_favorite_place(request.user, place):
         return {
             "status": HTTPStatus.BAD_REQUEST,
-            "user_id": profile.user.id,
+            "user_id": request.user.id,
             "msg": f"The place id '{params.google_place_id}' has already been favorited by this user.",
         }
 
-    profile.favorite_places.append(model_to_dict(place))
-    profile.save()
-
     return {
         "status": HTTPStatus.OK,
-        "user_id": profile.user.id,
+        "user_id": request.user.id,
         "favorite_place": {
             "place_id": place.google_place_id,
         },
@@ -95,60 +195,39 @@ def remove_favorite_place(request: HttpRequest, params: PlaceSchema):
             "msg": "User must be authenticated for this method.",
         }
 
-    profile = UserProfile.objects.get(user=request.user)
-    place, created = Place.objects.get_or_create(google_place_id=params.google_place_id)
+    deleted_count, deleted_per_model = FavoritePlace.objects.filter(
+        user=request.user, place__google_place_id=params.google_place_id
+    ).delete()
 
-    if model_to_dict(place).get("google_place_id") not in [
-        favorite_place.get("google_place_id") for favorite_place in profile.favorite_places
-    ]:
+    if deleted_count == 0:
         return {
             "status": HTTPStatus.BAD_REQUEST,
-            "user_id": profile.user.id,
+            "user_id": request.user.id,
             "msg": f"The place id '{params.google_place_id}' has not already been favorited by this user.",
         }
 
-    profile.favorite_places.remove(model_to_dict(place))
-    profile.save()
-
     return {
         "status": HTTPStatus.OK,
-        "user_id": profile.user.id,
+        "user_id": request.user.id,
         "favorite_place_removed": {
-            "place_id": place.google_place_id,
+            "place_id": params.google_place_id,
         },
     }
 
 
 @api.get("/get_reviews")
-def get_reviews(request: HttpRequest):
+def get_reviews(request: HttpRequest, cursor: Optional[str] = None, limit: int = REVIEWS_PAGE_SIZE):
     if not request.user.is_authenticated:
         return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
 
-    def parse_address(address_string):
-        pattern = r'<span class="([^"]+)">([^<]+)</span>'
-        matches = re.findall(pattern, address_string)
-        address_dict = {class_name.replace("-", "_"): content for class_name, content in matches}
-        return address_dict
-
-    user_reviews = []
-    for review in request.user.reviews_for_user.all():
-        place_result = gmaps.place(place_id=review.place.google_place_id)["result"]
-        user_reviews.append({
-            "google_place_id": review.place.google_place_id,
-            "place_name": place_result.get("name"),
-            "place_address": parse_address(place_result["adr_address"]),
-            "google_maps_page": place_result.get("url"),
-            "rating": review.rating,
-            "text": review.text,
-            "timestamp": review.timestamp,
-        })
+    try:
+        reviews, next_cursor = split_reviews_page(list(reviews_page_queryset(request.user, cursor, limit)), limit)
+    except ValueError as error:
+        return {"status": HTTPStatus.BAD_REQUEST, "msg": str(error)}
 
-    return {
-        "status": HTTPStatus.OK,
-        "user_id": request.user.id,
-        "username": request.user.username,
-        "reviews": user_reviews,
-    }
+    refresh_place_metadata(unique_places(reviews))
+
+    return build_reviews_response(request.user, reviews, next_cursor)
 
 
 @api.post("/add_review")
@@ -159,15 +238,111 @@ def add_review(request: HttpRequest, params: PlaceReviewSchema):
     place, created = Place.objects.get_or_create(google_place_id=params.place.google_place_id)
     place_review = PlaceReview.objects.create(place=place, user=request.user, rating=params.rating, text=params.text)
 
+    return build_added_review_response(request.user, place_review)
+
+
+@api.get("/async/get_favorite_places")
+@async_gateway.with_client
+async def get_favorite_places_async(request: HttpRequest):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    places = [
+        favorite_place.place
+        async for favorite_place in user.favorite_places.select_related("place").order_by("created_at")
+    ]
+    await arefresh_place_metadata(places)
+
     return {
         "status": HTTPStatus.OK,
-        "user_id": request.user.id,
-        "username": request.user.username,
-        "review": {
-            "place": model_to_dict(place_review.place),
-            "username": place_review.user.username,
-            "rating": place_review.rating,
-            "text": place_review.text,
-            "timestamp": place_review.timestamp,
+        "user_id": user.id,
+        "favorite_places": [build_favorite_place_response(place) for place in places],
+    }
+
+
+@api.post("/async/add_favorite_place")
+async def add_favorite_place_async(request: HttpRequest, params: PlaceSchema):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return {
+            "status": HTTPStatus.FORBIDDEN,
+            "msg": "User must be authenticated for this method.",
+        }
+
+    place, created = await Place.objects.aget_or_create(google_place_id=params.google_place_id)
+
+    if not await sync_to_async(create_favorite_place)(user, place):
+        return {
+            "status": HTTPStatus.BAD_REQUEST,
+            "user_id": user.id,
+            "msg": f"The place id '{params.google_place_id}' has already been favorited by this user.",
+        }
+
+    return {
+        "status": HTTPStatus.OK,
+        "user_id": user.id,
+        "favorite_place": {
+            "place_id": place.google_place_id,
+        },
+    }
+
+
+@api.put("/async/remove_favorite_place")
+async def remove_favorite_place_async(request: HttpRequest, params: PlaceSchema):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return {
+            "status": HTTPStatus.FORBIDDEN,
+            "msg": "User must be authenticated for this method.",
+        }
+
+    deleted_count, deleted_per_model = await FavoritePlace.objects.filter(
+        user=user, place__google_place_id=params.google_place_id
+    ).adelete()
+
+    if deleted_count == 0:
+        return {
+            "status": HTTPStatus.BAD_REQUEST,
+            "user_id": user.id,
+            "msg": f"The place id '{params.google_place_id}' has not already been favorited by this user.",
+        }
+
+    return {
+        "status": HTTPStatus.OK,
+        "user_id": user.id,
+        "favorite_place_removed": {
+            "place_id": params.google_place_id,
         },
     }
+
+
+@api.get("/async/get_reviews")
+@async_gateway.with_client
+async def get_reviews_async(request: HttpRequest, cursor: Optional[str] = None, limit: int = REVIEWS_PAGE_SIZE):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    try:
+        reviews, next_cursor = split_reviews_page(
+            [review async for review in reviews_page_queryset(user, cursor, limit)], limit
+        )
+    except ValueError as error:
+        return {"status": HTTPStatus.BAD_REQUEST, "msg": str(error)}
+
+    await arefresh_place_metadata(unique_places(reviews))
+
+    return build_reviews_response(user, reviews, next_cursor)
+
+
+@api.post("/async/add_review")
+async def add_review_async(request: HttpRequest, params: PlaceReviewSchema):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return {"status": HTTPStatus.FORBIDDEN, "msg": "User must be authenticated for this method."}
+
+    place, created = await Place.objects.aget_or_create(google_place_id=params.place.google_place_id)
+    place_review = await PlaceReview.objects.acreate(place=place, user=user, rating=params.rating, text=params.text)
+
+    return build_added_review_response(user, place_review)
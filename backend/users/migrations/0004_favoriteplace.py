@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_favorite_places_to_table(apps, schema_editor):
+    UserProfile = apps.get_model("users", "UserProfile")
+    Place = apps.get_model("maps", "Place")
+    FavoritePlace = apps.get_model("users", "FavoritePlace")
+
+    for profile in UserProfile.objects.all():
+        for favorite_place in profile.favorite_places:
+            place, created = Place.objects.get_or_create(
+                google_place_id=favorite_place["google_place_id"]
+            )
+            FavoritePlace.objects.get_or_create(
+                user_id=profile.user_id, place=place
+            )
+
+
+def copy_favorite_places_to_json(apps, schema_editor):
+    UserProfile = apps.get_model("users", "UserProfile")
+    FavoritePlace = apps.get_model("users", "FavoritePlace")
+
+    for profile in UserProfile.objects.all():
+        profile.favorite_places = [
+            {
+                "id": favorite_place.place.id,
+                "google_place_id": favorite_place.place.google_place_id,
+            }
+            for favorite_place in FavoritePlace.objects.filter(
+                user_id=profile.user_id
+            ).select_related("place")
+        ]
+        profile.save()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("maps", "0007_geocoderesult"),
+        ("users", "0003_remove_userprofile_favorite_places_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FavoritePlace",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "place",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="favorited_by",
+                        to="maps.place",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="favorite_places",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "place"),
+                        name="unique_favorite_place_per_user",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            copy_favorite_places_to_table, copy_favorite_places_to_json
+        ),
+        migrations.RemoveField(
+            model_name="userprofile",
+            name="favorite_places",
+        ),
+    ]
@@ -5,4 +5,20 @@ from maps.models import Place
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    favorite_places = models.JSONField(blank=True, default=list)
+
+
+class FavoritePlace(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="favorite_places"
+    )
+    place = models.ForeignKey(
+        Place, on_delete=models.CASCADE, related_name="favorited_by"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "place"], name="unique_favorite_place_per_user"
+            ),
+        ]
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from users.models import FavoritePlace
+
+
+class AddFavoritePlaceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="favorites")
+
+    def test_a_place_is_favorited_once(self):
+        self.client.force_login(self.user)
+
+        first, second = [
+            self.client.post(
+                "/users/api/add_favorite_place",
+                {"google_place_id": "favorite"},
+                content_type="application/json",
+            ).json()
+            for _ in range(2)
+        ]
+
+        self.assertEqual((first["status"], second["status"]), (200, 400))
+        self.assertEqual(
+            FavoritePlace.objects.filter(user=self.user).count(), 1
+        )
+
+    async def test_a_place_is_favorited_once_by_the_async_view(self):
+        # Runs inside the test's transaction, where a duplicate INSERT without
+        # a savepoint would break every later query
+        await self.async_client.aforce_login(self.user)
+
+        first, second = [
+            (
+                await self.async_client.post(
+                    "/users/api/async/add_favorite_place",
+                    {"google_place_id": "favorite"},
+                    content_type="application/json",
+                )
+            ).json()
+            for _ in range(2)
+        ]
+
+        self.assertEqual((first["status"], second["status"]), (200, 400))
+        self.assertEqual(
+            await FavoritePlace.objects.filter(user=self.user).acount(), 1
+        )
@@ -0,0 +1,70 @@
+import importlib
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from maps.models import Place
+from users.models import FavoritePlace
+
+favoriteplace_migration = importlib.import_module(
+    "users.migrations.0004_favoriteplace"
+)
+
+
+class CopyFavoritePlacesToTableTests(TestCase):
+    """
+    Tests don't run migrations, so the data migration is called directly,
+    with the profiles' old favorite_places JSON field stubbed out since the
+    current UserProfile no longer has it
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="migrated")
+
+    def migrate(self, favorite_places):
+        profile = SimpleNamespace(
+            user_id=self.user.id, favorite_places=favorite_places
+        )
+        UserProfile = SimpleNamespace(
+            objects=mock.Mock(**{"all.return_value": [profile]})
+        )
+        models = {
+            ("users", "UserProfile"): UserProfile,
+            ("maps", "Place"): Place,
+            ("users", "FavoritePlace"): FavoritePlace,
+        }
+        apps = SimpleNamespace(
+            get_model=lambda app_label, model_name: models[
+                (app_label, model_name)
+            ]
+        )
+        favoriteplace_migration.copy_favorite_places_to_table(apps, None)
+
+    def favorited_google_place_ids(self):
+        return sorted(
+            FavoritePlace.objects.filter(user=self.user).values_list(
+                "place__google_place_id", flat=True
+            )
+        )
+
+    def test_a_place_listed_twice_is_favorited_once(self):
+        place = Place.objects.create(google_place_id="twice")
+
+        self.migrate(
+            [
+                {"id": place.id, "google_place_id": "twice"},
+                {"id": place.id, "google_place_id": "twice"},
+            ]
+        )
+
+        self.assertEqual(self.favorited_google_place_ids(), ["twice"])
+
+    def test_a_missing_place_is_created(self):
+        self.migrate([{"id": 404, "google_place_id": "missing"}])
+
+        self.assertEqual(self.favorited_google_place_ids(), ["missing"])
+        self.assertTrue(
+            Place.objects.filter(google_place_id="missing").exists()
+        )
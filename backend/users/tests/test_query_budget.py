@@ -0,0 +1,111 @@
+from core.query_budget import assert_query_budget
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from maps.gateway import cache
+from maps.models import Place, PlaceReview
+from users.models import FavoritePlace
+
+
+class UsersQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="budget")
+        self.client.force_login(self.user)
+
+    def create_places(self, count):
+        places, created = Place.objects.get_or_create_many(
+            [f"fake-33.7756--84.3963-{index}" for index in range(count)]
+        )
+        return list(places.values())
+
+    def get(self, route):
+        with assert_query_budget(route) as profile:
+            response = self.client.get(f"/{route}")
+        self.assertEqual(response.status_code, 200)
+        return profile.count
+
+    def query_counts(self, route, model, build):
+        """
+        Queries route runs for 3 and for 20 rows of model built from places
+        """
+        counts = []
+        for count in [3, 20]:
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [build(place) for place in self.create_places(count)]
+            )
+            counts.append(self.get(route))
+        return counts
+
+    def test_favorite_places_stay_within_budget(self):
+        small, large = self.query_counts(
+            "users/api/get_favorite_places",
+            FavoritePlace,
+            lambda place: FavoritePlace(user=self.user, place=place),
+        )
+        self.assertEqual(small, large)
+
+    def test_reviews_stay_within_budget(self):
+        small, large = self.query_counts(
+            "users/api/get_reviews",
+            PlaceReview,
+            lambda place: PlaceReview(
+                user=self.user, place=place, rating=4, text="Fine"
+            ),
+        )
+        self.assertEqual(small, large)
+
+
+class UsersWriteQueryBudgetTests(TestCase):
+    """
+    Adding a favorite or a review for a place that is not stored yet is the
+    most expensive path, since the Place is created first
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="writer")
+
+    def test_add_favorite_place_stays_within_budget(self):
+        self.client.force_login(self.user)
+        with assert_query_budget("users/api/add_favorite_place"):
+            self.client.post(
+                "/users/api/add_favorite_place",
+                {"google_place_id": "new"},
+                content_type="application/json",
+            )
+
+    def test_add_review_stays_within_budget(self):
+        self.client.force_login(self.user)
+        with assert_query_budget("users/api/add_review"):
+            self.client.post(
+                "/users/api/add_review",
+                {
+                    "place": {"google_place_id": "new"},
+                    "rating": 4,
+                    "text": "Fine",
+                },
+                content_type="application/json",
+            )
+
+    async def test_async_add_favorite_place_stays_within_budget(self):
+        await self.async_client.aforce_login(self.user)
+        with assert_query_budget("users/api/async/add_favorite_place"):
+            await self.async_client.post(
+                "/users/api/async/add_favorite_place",
+                {"google_place_id": "new"},
+                content_type="application/json",
+            )
+
+    async def test_async_add_review_stays_within_budget(self):
+        await self.async_client.aforce_login(self.user)
+        with assert_query_budget("users/api/async/add_review"):
+            await self.async_client.post(
+                "/users/api/async/add_review",
+                {
+                    "place": {"google_place_id": "new"},
+                    "rating": 4,
+                    "text": "Fine",
+                },
+                content_type="application/json",
+            )
@@ -0,0 +1,57 @@
+from base64 import urlsafe_b64encode
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from maps.models import Place, PlaceReview
+from users.api import decode_reviews_cursor
+
+
+def cursor(text):
+    return urlsafe_b64encode(text.encode()).decode()
+
+
+class ReviewsCursorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="reviewer")
+        self.client.force_login(self.user)
+        place = Place.objects.create(google_place_id="reviewed")
+        for rating in range(1, 6):
+            PlaceReview.objects.create(
+                place=place, user=self.user, rating=rating, text="Fine"
+            )
+
+    def get_reviews(self, **params):
+        return self.client.get("/users/api/get_reviews", params).json()
+
+    def test_pages_follow_each_other(self):
+        first = self.get_reviews(limit=3)
+        second = self.get_reviews(limit=3, cursor=first["next_cursor"])
+
+        self.assertEqual(len(first["reviews"]), 3)
+        self.assertEqual(len(second["reviews"]), 2)
+        self.assertIsNone(second["next_cursor"])
+
+    def test_malformed_cursors_are_rejected(self):
+        for malformed in [
+            "not base64!",
+            cursor("abc"),
+            cursor("not-a-date|1"),
+            cursor("2024-01-01T00:00:00|x"),
+            cursor("2024-01-01|1|2"),
+        ]:
+            with self.subTest(cursor=malformed):
+                self.assertEqual(
+                    self.get_reviews(cursor=malformed),
+                    {"status": 400, "msg": "Invalid cursor"},
+                )
+
+    def test_naive_timestamps_are_read_as_utc(self):
+        timestamp, review_id = decode_reviews_cursor(
+            cursor("2024-01-01T12:00:00|7")
+        )
+
+        self.assertTrue(timezone.is_aware(timestamp))
+        self.assertEqual(timestamp.utcoffset().total_seconds(), 0)
+        self.assertEqual(review_id, 7)